@@ -0,0 +1,44 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+class AsyncDatabase:
+    # The BigQuery client is synchronous; run its calls on a bounded thread
+    # pool so a slow query never blocks the event loop.
+    def __init__(self, db, max_workers: int = 16, max_concurrency: int = 64, timeout: float = 30.0):
+        self.db = db
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='bigquery')
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(self, func: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        # The timeout covers waiting for a slot as well as the call itself. A
+        # timed-out caller gets its error straight away, but the thread keeps
+        # running the BigQuery call, so the slot is only released once it ends;
+        # otherwise the limit would stop bounding the work actually in flight.
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (timeout or self.timeout)
+        await asyncio.wait_for(self._semaphore.acquire(), deadline - loop.time())
+        try:
+            future = loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+        except BaseException:
+            self._semaphore.release()
+            raise
+        future.add_done_callback(lambda _: self._semaphore.release())
+        return await asyncio.wait_for(asyncio.shield(future), max(0.0, deadline - loop.time()))
+
+    async def gather(self, *calls) -> list:
+        return list(await asyncio.gather(*calls))
+
+    def __getattr__(self, name: str):
+        method = getattr(self.db, name)
+        if not callable(method):
+            return method
+
+        async def call(*args, **kwargs):
+            return await self.run(method, *args, **kwargs)
+        return call
+
+    def close(self):
+        self._executor.shutdown(wait=False)
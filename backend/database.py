@@ -1,6 +1,80 @@
 from google.cloud import bigquery
-from typing import List, Optional
+from cache import QueryCache
+from events import EventBus, case_summary
+from search_index import TrigramIndex
+from stats import DashboardCounters, STAT_COLUMNS
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, List, Optional, Tuple
+from write_buffer import WriteBuffer
+import base64
+import json
+import metrics
 import os
+import time
+import uuid
+
+CASE_COLUMNS = (
+    'case_id', 'customer_name', 'description', 'priority', 'type', 'product', 'status', 'geography',
+    'created_date', 'module', 'sub_module', 'category', 'similar_case_url', 'comments', 'jira_id',
+    'snow_id', 'mail_chain', 'ROOTCAUSE'
+)
+# Keyset pagination orders on (created_date, case_id), so both are always selected
+CURSOR_COLUMNS = ('case_id', 'created_date')
+FACET_COLUMNS = ('product', 'priority', 'type', 'status', 'geography')
+DEFAULT_PAGE_SIZE = 50
+# Upper bound on ids per query parameter array for track (un)assignment
+TRACK_BATCH_SIZE = 10000
+# Above this many search index hits the id list costs more than a LIKE scan
+MAX_SEARCH_CANDIDATES = 10000
+# Rows created this long before a search index rebuild started are still
+# LIKE-scanned, to cover writers whose clocks or commits lag
+SEARCH_INDEX_OVERLAP = timedelta(minutes=5)
+MAX_PAGE_SIZE = 500
+# GET /api/cases/{id} returns comments merged with the case_comments log and
+# the edit form PUTs the whole case back; writing that into cases.comments
+# would duplicate every logged comment. Comments only change through
+# add_comment_to_case.
+READ_ONLY_COLUMNS = ('case_id', 'comments')
+
+class BatchInsertError(Exception):
+    # Some rows of a streaming insert were rejected; the rest are in the table
+    def __init__(self, message: str, inserted: List[dict], failed: List[dict]):
+        super().__init__(message)
+        self.inserted = inserted
+        self.failed = failed
+
+def select_columns(fields: Optional[List[str]]) -> str:
+    if not fields:
+        return "*"
+    unknown = [field for field in fields if field not in CASE_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return ", ".join(dict.fromkeys(CURSOR_COLUMNS + tuple(fields)))
+
+def merge_comments(case: dict, comments: List[dict]) -> dict:
+    # Older comments live newline-separated in the cases.comments column;
+    # newer ones come from the case_comments log, oldest first.
+    legacy = case.get('comments') or ''
+    lines = ([legacy] if legacy else []) + [item['comment'] for item in comments]
+    case['comments'] = '\n'.join(lines)
+    return case
+
+def page_size(limit: int) -> int:
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+def encode_cursor(case: dict) -> str:
+    created_date = case['created_date']
+    if isinstance(created_date, datetime):
+        created_date = created_date.isoformat()
+    payload = json.dumps([created_date, case['case_id']])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        created_date, case_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_date), case_id
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
 
 class Database:
     def __init__(self):
@@ -8,49 +82,145 @@ class Database:
         self.dataset = 'project_canary'
         self.table = 'cases'
         self.table_ref = f'{self.project}.{self.dataset}.{self.table}'
+        self.comments_table_ref = f'{self.project}.{self.dataset}.case_comments'
         self.client = bigquery.Client(project=self.project)
+        self.cache = QueryCache(max_entries=256, ttl=60)
+        self.counters = DashboardCounters()
+        self.search_index = TrigramIndex()
+        self.events = EventBus()
+        self.similarity_writer = WriteBuffer('case_similarity', self._write_similarities, max_rows=500, max_delay=5.0)
+        self.track_map_writer = WriteBuffer('case_track_map', self._write_track_mappings, max_rows=1000, max_delay=5.0)
+
+    def _invalidate(self, *tags):
+        self.cache.invalidate(*tags)
+
+    def _query(self, method: str, query: str, job_config: Optional[bigquery.QueryJobConfig] = None, **result_kwargs):
+        started = time.perf_counter()
+        try:
+            job = self.client.query(query, job_config=job_config)
+            rows = job.result(**result_kwargs)
+        except Exception:
+            metrics.observe_error(method, started)
+            raise
+        metrics.observe_query(method, started, job)
+        return rows
 
-    def get_all_cases(self) -> List[dict]:
-        query = f"SELECT * FROM `{self.table_ref}` ORDER BY created_date DESC"
-        return [dict(row) for row in self.client.query(query).result()]
+    def _insert_rows(self, method: str, table: str, rows: List[dict],
+                     row_ids: Optional[List[str]] = None, skip_invalid_rows: bool = False) -> list:
+        started = time.perf_counter()
+        try:
+            errors = self.client.insert_rows_json(table, rows, row_ids=row_ids,
+                                                  skip_invalid_rows=skip_invalid_rows)
+        except Exception:
+            metrics.observe_error(method, started)
+            raise
+        metrics.observe_query(method, started)
+        metrics.ROWS_INSERTED.labels(method).inc(len(rows) - len(errors))
+        return errors
+
+    def get_all_cases(self, fields: Optional[List[str]] = None, cursor: Optional[str] = None,
+                      limit: Optional[int] = None) -> List[dict]:
+        return self._list_cases(('get_all_cases',), [], [], fields, cursor, limit)
 
     def get_case_count(self) -> int:
         query = f"SELECT COUNT(*) as total FROM `{self.table_ref}`"
-        result = self.client.query(query).result()
-        return list(result)[0]['total']
+        return self.cache.get_or_load(
+            ('get_case_count',),
+            lambda: list(self._query('get_case_count', query))[0]['total'],
+            tags=('cases',)
+        )
 
-    def get_cases_by_priority(self, priority: str) -> List[dict]:
-        query = f"SELECT * FROM `{self.table_ref}` WHERE priority = @priority ORDER BY created_date DESC"
-        job_config = bigquery.QueryJobConfig(
-            query_parameters=[bigquery.ScalarQueryParameter("priority", "STRING", priority)]
+    def get_distinct_case_count(self) -> int:
+        # The table can hold repeated case_ids; the similarity index keeps one
+        # row per id, so this is the count to compare it against
+        query = f"SELECT COUNT(DISTINCT case_id) as total FROM `{self.table_ref}`"
+        return self.cache.get_or_load(
+            ('get_distinct_case_count',),
+            lambda: list(self._query('get_distinct_case_count', query))[0]['total'],
+            tags=('cases',)
         )
-        return [dict(row) for row in self.client.query(query, job_config=job_config).result()]
 
-    def get_cases_by_type(self, case_type: str) -> List[dict]:
-        query = f"SELECT * FROM `{self.table_ref}` WHERE type = @type ORDER BY created_date DESC"
+    def get_cases_created_after(self, since: datetime) -> List[dict]:
+        query = f"""
+            SELECT case_id, description, created_date
+            FROM `{self.table_ref}`
+            WHERE created_date > @since
+        """
         job_config = bigquery.QueryJobConfig(
-            query_parameters=[bigquery.ScalarQueryParameter("type", "STRING", case_type)]
+            query_parameters=[bigquery.ScalarQueryParameter("since", "TIMESTAMP", since)]
         )
-        return [dict(row) for row in self.client.query(query, job_config=job_config).result()]
+        return [dict(row) for row in self._query('get_cases_created_after', query, job_config)]
 
-    def get_cases_by_status(self, status: str) -> List[dict]:
-        query = f"SELECT * FROM `{self.table_ref}` WHERE status = @status ORDER BY created_date DESC"
-        job_config = bigquery.QueryJobConfig(
-            query_parameters=[bigquery.ScalarQueryParameter("status", "STRING", status)]
+    def get_cases_by_priority(self, priority: str, fields: Optional[List[str]] = None,
+                              cursor: Optional[str] = None, limit: Optional[int] = None) -> List[dict]:
+        return self._list_cases(
+            ('get_cases_by_priority', priority),
+            ["priority = @priority"],
+            [bigquery.ScalarQueryParameter("priority", "STRING", priority)],
+            fields, cursor, limit
+        )
+
+    def get_cases_by_priorities(self, priorities: List[str], fields: Optional[List[str]] = None,
+                                cursor: Optional[str] = None, limit: Optional[int] = None) -> List[dict]:
+        return self._list_cases(
+            ('get_cases_by_priorities', tuple(priorities)),
+            ["priority IN UNNEST(@priorities)"],
+            [bigquery.ArrayQueryParameter("priorities", "STRING", list(priorities))],
+            fields, cursor, limit
+        )
+
+    def get_cases_by_type(self, case_type: str, fields: Optional[List[str]] = None,
+                          cursor: Optional[str] = None, limit: Optional[int] = None) -> List[dict]:
+        return self._list_cases(
+            ('get_cases_by_type', case_type),
+            ["type = @type"],
+            [bigquery.ScalarQueryParameter("type", "STRING", case_type)],
+            fields, cursor, limit
+        )
+
+    def get_cases_by_status(self, status: str, fields: Optional[List[str]] = None,
+                            cursor: Optional[str] = None, limit: Optional[int] = None) -> List[dict]:
+        return self._list_cases(
+            ('get_cases_by_status', status),
+            ["status = @status"],
+            [bigquery.ScalarQueryParameter("status", "STRING", status)],
+            fields, cursor, limit
         )
-        return [dict(row) for row in self.client.query(query, job_config=job_config).result()]
 
     def search_cases(self, customer_name: Optional[str] = None, case_id: Optional[str] = None,
                     product: Optional[str] = None, priority: Optional[str] = None,
-                    case_type: Optional[str] = None) -> List[dict]:
+                    case_type: Optional[str] = None, fields: Optional[List[str]] = None,
+                    cursor: Optional[str] = None, limit: Optional[int] = None) -> List[dict]:
         conditions = []
         params = []
+        candidate_ids = None
+        built_at = self.search_index.built_at
+        if (customer_name or case_id) and self.search_index.ready:
+            candidate_ids = self.search_index.search(customer_name, case_id)
+            # A miss may be a row another worker or the agent pipeline wrote
+            # before the last rebuild, so let the LIKE scan have the final say.
+            if not candidate_ids or len(candidate_ids) > MAX_SEARCH_CANDIDATES:
+                candidate_ids = None
+
+        like_conditions = []
         if customer_name:
-            conditions.append("customer_name LIKE @customer_name")
-            params.append(bigquery.ScalarQueryParameter("customer_name", "STRING", f"%{customer_name}%"))
+            like_conditions.append("LOWER(customer_name) LIKE @customer_name")
+            params.append(bigquery.ScalarQueryParameter("customer_name", "STRING", f"%{customer_name.lower()}%"))
         if case_id:
-            conditions.append("case_id LIKE @case_id")
-            params.append(bigquery.ScalarQueryParameter("case_id", "STRING", f"%{case_id}%"))
+            like_conditions.append("LOWER(case_id) LIKE @case_id")
+            params.append(bigquery.ScalarQueryParameter("case_id", "STRING", f"%{case_id.lower()}%"))
+        if candidate_ids is not None:
+            # Substring filters already resolved in memory for rows the index
+            # has seen; rows other writers created since the rebuild started
+            # are not in it, so those still go through LIKE.
+            conditions.append(
+                f"(case_id IN UNNEST(@candidate_ids) OR "
+                f"(created_date >= @index_built_at AND {' AND '.join(like_conditions)}))"
+            )
+            params.append(bigquery.ArrayQueryParameter("candidate_ids", "STRING", candidate_ids))
+            params.append(bigquery.ScalarQueryParameter("index_built_at", "TIMESTAMP", built_at))
+        else:
+            conditions.extend(like_conditions)
         if product:
             conditions.append("product = @product")
             params.append(bigquery.ScalarQueryParameter("product", "STRING", product))
@@ -60,51 +230,170 @@ class Database:
         if case_type:
             conditions.append("type = @type")
             params.append(bigquery.ScalarQueryParameter("type", "STRING", case_type))
+        return self._list_cases(
+            ('search_cases', customer_name, case_id, product, priority, case_type, built_at),
+            conditions, params, fields, cursor, limit
+        )
+
+    def build_search_index(self):
+        started = datetime.now(timezone.utc)
+        batch = []
+        for case in self.iter_cases(fields=['customer_name'], page_size=10000):
+            batch.append(case)
+            if len(batch) >= 10000:
+                self.search_index.add_cases(batch)
+                batch = []
+        self.search_index.add_cases(batch)
+        self.search_index.built_at = started - SEARCH_INDEX_OVERLAP
+        self.search_index.ready = True
+
+    def iter_cases(self, fields: Optional[List[str]] = None, status: Optional[str] = None,
+                   priority: Optional[str] = None, case_type: Optional[str] = None,
+                   product: Optional[str] = None, page_size: int = 1000) -> Iterator[dict]:
+        conditions = []
+        params = []
+        for column, value in (('status', status), ('priority', priority), ('type', case_type), ('product', product)):
+            if value:
+                conditions.append(f"{column} = @{column}")
+                params.append(bigquery.ScalarQueryParameter(column, "STRING", value))
+        where_clause = " AND ".join(conditions) if conditions else "1=1"
+        query = (
+            f"SELECT {select_columns(fields)} FROM `{self.table_ref}` WHERE {where_clause}"
+            " ORDER BY created_date DESC, case_id DESC"
+        )
+        job_config = bigquery.QueryJobConfig(query_parameters=params)
+        # Walk the result one API page at a time; only the current page is held in memory
+        rows = self._query('iter_cases', query, job_config, page_size=page_size)
+        for page in rows.pages:
+            for row in page:
+                yield dict(row)
+
+    def _list_cases(self, key: tuple, conditions: List[str], params: list, fields: Optional[List[str]],
+                    cursor: Optional[str], limit: Optional[int]) -> List[dict]:
+        conditions = list(conditions)
+        params = list(params)
+        if cursor:
+            cursor_created_date, cursor_case_id = decode_cursor(cursor)
+            conditions.append(
+                "(created_date < @cursor_created_date"
+                " OR (created_date = @cursor_created_date AND case_id < @cursor_case_id))"
+            )
+            params.append(bigquery.ScalarQueryParameter("cursor_created_date", "TIMESTAMP", cursor_created_date))
+            params.append(bigquery.ScalarQueryParameter("cursor_case_id", "STRING", cursor_case_id))
         where_clause = " AND ".join(conditions) if conditions else "1=1"
-        query = f"SELECT * FROM `{self.table_ref}` WHERE {where_clause} ORDER BY created_date DESC"
+        query = (
+            f"SELECT {select_columns(fields)} FROM `{self.table_ref}` WHERE {where_clause}"
+            " ORDER BY created_date DESC, case_id DESC"
+        )
         job_config = bigquery.QueryJobConfig(query_parameters=params)
-        return [dict(row) for row in self.client.query(query, job_config=job_config).result()]
+        if limit is None:
+            # Full-table reads would pin every row in the cache for the TTL and
+            # be copied again on each hit; only pages are worth caching.
+            return [dict(row) for row in self._query(key[0], query, job_config)]
+        query += f" LIMIT {page_size(limit)}"
+        return self.cache.get_or_load(
+            key + (tuple(fields) if fields else None, cursor, limit),
+            lambda: [dict(row) for row in self._query(key[0], query, job_config)],
+            tags=('cases',)
+        )
 
     def insert_case(self, case_data: dict):
-        errors = self.client.insert_rows_json(self.table_ref, [case_data])
+        errors = self._insert_rows('insert_case', self.table_ref, [case_data], row_ids=[case_data['case_id']])
+        self._invalidate('cases', ('case', case_data.get('case_id')))
+        self._index_inserted([case_data], errors)
         if errors:
             raise Exception(f"BigQuery insert error: {errors}")
 
     def get_case_by_id(self, case_id: str) -> Optional[dict]:
+        return self.cache.get_or_load(
+            ('get_case_by_id', case_id),
+            lambda: self._fetch_case_by_id(case_id),
+            tags=(('case', case_id),)
+        )
+
+    def _fetch_case_by_id(self, case_id: str) -> Optional[dict]:
         query = f"SELECT * FROM `{self.table_ref}` WHERE case_id = @case_id LIMIT 1"
         job_config = bigquery.QueryJobConfig(
             query_parameters=[bigquery.ScalarQueryParameter("case_id", "STRING", case_id)]
         )
-        result = list(self.client.query(query, job_config=job_config).result())
+        result = list(self._query('get_case_by_id', query, job_config))
         return dict(result[0]) if result else None
 
+    def get_cases_by_ids(self, case_ids: List[str]) -> List[dict]:
+        case_ids = list(dict.fromkeys(case_ids))
+        if not case_ids:
+            return []
+        query = f"SELECT * FROM `{self.table_ref}` WHERE case_id IN UNNEST(@case_ids)"
+        job_config = bigquery.QueryJobConfig(
+            query_parameters=[bigquery.ArrayQueryParameter("case_ids", "STRING", case_ids)]
+        )
+        return self.cache.get_or_load(
+            ('get_cases_by_ids', tuple(case_ids)),
+            lambda: self._fetch_cases_by_ids(query, job_config, case_ids),
+            tags=tuple(('case', case_id) for case_id in case_ids)
+        )
+
+    def _fetch_cases_by_ids(self, query: str, job_config: bigquery.QueryJobConfig, case_ids: List[str]) -> List[dict]:
+        rows = {row['case_id']: dict(row) for row in self._query('get_cases_by_ids', query, job_config)}
+        # Keep the caller's ordering; IN UNNEST returns rows in arbitrary order
+        return [rows[case_id] for case_id in case_ids if case_id in rows]
+
     def insert_cases_batch(self, cases: List[dict]):
-        errors = self.client.insert_rows_json(self.table_ref, cases)
+        # case_id as insertId lets BigQuery drop rows a retried submission resends.
+        # Invalid rows are skipped instead of failing the whole batch, and come
+        # back on BatchInsertError.failed for the caller to retry.
+        errors = self._insert_rows('insert_cases_batch', self.table_ref, cases,
+                                   row_ids=[case['case_id'] for case in cases], skip_invalid_rows=True)
+        self._invalidate('cases', *[('case', case.get('case_id')) for case in cases])
+        inserted = self._index_inserted(cases, errors)
         if errors:
-            raise Exception(f"BigQuery batch insert error: {errors}")
+            failed = {error['index'] for error in errors}
+            raise BatchInsertError(f"BigQuery batch insert error: {errors}", inserted,
+                                   [case for index, case in enumerate(cases) if index in failed])
         return cases
 
     def insert_similarity(self, case_id: str, related_case_id: str, similarity_score: float):
-        similarity_table = f'{self.dataset}.case_similarity'
-        row = {
+        self.similarity_writer.add({
             'id': f'{case_id}_{related_case_id}',
             'case_id': case_id,
             'related_case_id': related_case_id,
             'similarity_score': similarity_score,
-            'created_date': bigquery._helpers._datetime_to_json()
-        }
-        errors = self.client.insert_rows_json(similarity_table, [row])
-        if errors:
-            raise Exception(f"BigQuery similarity insert error: {errors}")
+            'created_date': datetime.now(timezone.utc).isoformat()
+        })
+
+    def _write_similarities(self, rows: List[dict]) -> List[int]:
+        similarity_table = f'{self.dataset}.case_similarity'
+        errors = self._insert_rows('insert_similarity', similarity_table, rows)
+        return [error['index'] for error in errors]
 
     def delete_similarities_for_case(self, case_id: str):
-        query = f"DELETE FROM `{self.dataset}.case_similarity` WHERE case_id = @case_id"
+        self.delete_similarities_for_cases([case_id])
+
+    def delete_similarities_for_cases(self, case_ids: List[str]):
+        if not case_ids:
+            return
+        query = f"DELETE FROM `{self.dataset}.case_similarity` WHERE case_id IN UNNEST(@case_ids)"
         job_config = bigquery.QueryJobConfig(
-            query_parameters=[bigquery.ScalarQueryParameter("case_id", "STRING", case_id)]
+            query_parameters=[bigquery.ArrayQueryParameter("case_ids", "STRING", case_ids)]
         )
-        self.client.query(query, job_config=job_config).result()
+        self._query('delete_similarities_for_cases', query, job_config)
+
+    def _index_inserted(self, cases: List[dict], errors: list) -> List[dict]:
+        failed = {error['index'] for error in errors}
+        inserted = [case for index, case in enumerate(cases) if index not in failed]
+        self.counters.add_cases(inserted)
+        self.search_index.add_cases(inserted)
+        for case in inserted:
+            self.events.publish('case_created', case_summary(case))
+        return inserted
 
     def get_dashboard_stats(self):
+        stats = self.counters.snapshot()
+        if stats is None:
+            stats = self.reconcile_dashboard_stats()
+        return stats
+
+    def reconcile_dashboard_stats(self) -> dict:
         query = f"""
         SELECT
             COUNT(*) AS total_cases,
@@ -113,13 +402,45 @@ class Database:
             SUM(CASE WHEN status = 'Open' THEN 1 ELSE 0 END) AS open_cases
         FROM `{self.table_ref}`
         """
-        result = list(self.client.query(query).result())[0]
-        return {
-            'total_cases': result['total_cases'],
-            'high_priority': result['high_priority'],
-            'incidents': result['incidents'],
-            'open_cases': result['open_cases']
-        }
+        result = list(self._query('reconcile_dashboard_stats', query))[0]
+        self.counters.reset(result)
+        return self.counters.snapshot()
+
+    def get_facets(self, filters: Optional[dict] = None) -> dict:
+        filters = {column: value for column, value in (filters or {}).items() if value}
+        unknown = [column for column in filters if column not in FACET_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown facet filters: {', '.join(unknown)}")
+        conditions = [f"{column} = @{column}" for column in filters]
+        params = [bigquery.ScalarQueryParameter(column, "STRING", value) for column, value in filters.items()]
+        where_clause = " AND ".join(conditions) if conditions else "1=1"
+        # One job: filter once, then count every dimension over the same rows
+        facet_queries = " UNION ALL ".join(
+            f"SELECT '{column}' AS facet, CAST({column} AS STRING) AS value, COUNT(*) AS count "
+            f"FROM filtered GROUP BY {column}"
+            for column in FACET_COLUMNS
+        )
+        query = f"""
+            WITH filtered AS (
+                SELECT {", ".join(FACET_COLUMNS)} FROM `{self.table_ref}` WHERE {where_clause}
+            )
+            {facet_queries}
+        """
+        job_config = bigquery.QueryJobConfig(query_parameters=params)
+        return self.cache.get_or_load(
+            ('get_facets', tuple(sorted(filters.items()))),
+            lambda: self._fetch_facets(query, job_config),
+            tags=('cases',)
+        )
+
+    def _fetch_facets(self, query: str, job_config: bigquery.QueryJobConfig) -> dict:
+        facets = {column: [] for column in FACET_COLUMNS}
+        for row in self._query('get_facets', query, job_config):
+            if row['value'] is not None:
+                facets[row['facet']].append({'value': row['value'], 'count': row['count']})
+        for values in facets.values():
+            values.sort(key=lambda item: item['value'])
+        return facets
 
     def get_similar_cases(self, case_id: str, limit: int = 3) -> List[dict]:
         query = f"""
@@ -133,10 +454,17 @@ class Database:
                 bigquery.ScalarQueryParameter("case_id", "STRING", case_id)
             ]
         )
-        results = [dict(row) for row in self.client.query(query, job_config=job_config).result()]
-        return results
+        return self.cache.get_or_load(
+            ('get_similar_cases', case_id, limit),
+            lambda: [dict(row) for row in self._query('get_similar_cases', query, job_config)],
+            tags=(('case', case_id),)
+        )
 
     def update_case_by_id(self, case_id: str, updates: dict) -> Optional[dict]:
+        updates = {
+            key: value for key, value in updates.items()
+            if key in CASE_COLUMNS and key not in READ_ONLY_COLUMNS
+        }
         # Build SET clause and parameters
         set_clauses = []
         params = [bigquery.ScalarQueryParameter("case_id", "STRING", case_id)]
@@ -145,50 +473,85 @@ class Database:
             params.append(bigquery.ScalarQueryParameter(key, "STRING", value))
         if not set_clauses:
             return None
+        # Only pay for the extra read when the change can move a dashboard counter
+        before = self._fetch_case_by_id(case_id) if STAT_COLUMNS & updates.keys() else None
         set_clause = ", ".join(set_clauses)
         query = f"UPDATE `{self.table_ref}` SET {set_clause} WHERE case_id = @case_id"
         job_config = bigquery.QueryJobConfig(query_parameters=params)
-        self.client.query(query, job_config=job_config).result()
+        self._query('update_case_by_id', query, job_config)
+        self._invalidate('cases', ('case', case_id))
         # Return updated case
-        return self.get_case_by_id(case_id)
+        if 'customer_name' in updates:
+            self.search_index.add_cases([{'case_id': case_id, 'customer_name': updates['customer_name']}])
+        after = self.get_case_by_id(case_id)
+        if before and after:
+            self.counters.update_case(before, after)
+        if after:
+            self.events.publish('case_updated', {'case_id': case_id, 'changes': updates})
+        return after
 
     def add_comment_to_case(self, case_id: str, comment: str) -> Optional[dict]:
-        # Fetch current comments
         case = self.get_case_by_id(case_id)
         if not case:
             return None
-        current_comments = case.get('comments') or ''
-        # Append new comment (newline separated)
-        if current_comments:
-            updated_comments = current_comments + '\n' + comment
-        else:
-            updated_comments = comment
-        # Update in DB
-        query = f"UPDATE `{self.table_ref}` SET comments = @comments WHERE case_id = @case_id"
-        job_config = bigquery.QueryJobConfig(query_parameters=[
-            bigquery.ScalarQueryParameter("comments", "STRING", updated_comments),
-            bigquery.ScalarQueryParameter("case_id", "STRING", case_id)
-        ])
-        self.client.query(query, job_config=job_config).result()
-        return self.get_case_by_id(case_id)
+        # Comments are append-only rows, so concurrent writers never overwrite
+        # each other and the cost doesn't grow with the thread length.
+        row = {
+            'comment_id': str(uuid.uuid4()),
+            'case_id': case_id,
+            'comment': comment,
+            'created_date': datetime.now(timezone.utc).isoformat()
+        }
+        # The caller is waiting on this comment, so insert it directly and fail
+        # loudly rather than queueing it for background retries
+        errors = self._insert_rows('add_comment_to_case', self.comments_table_ref, [row])
+        if errors:
+            raise Exception(f"BigQuery insert error: {errors}")
+        self._invalidate(('comments', case_id))
+        self.events.publish('comment_added', row)
+        return self.get_case_with_comments(case_id)
+
+    def get_comments(self, case_id: str, limit: int = 50) -> List[dict]:
+        # case_comments is clustered on case_id, so this reads only that case's blocks
+        query = f"""
+            SELECT comment_id, comment, created_date
+            FROM `{self.comments_table_ref}`
+            WHERE case_id = @case_id
+            ORDER BY created_date DESC
+            LIMIT {page_size(limit)}
+        """
+        job_config = bigquery.QueryJobConfig(
+            query_parameters=[bigquery.ScalarQueryParameter("case_id", "STRING", case_id)]
+        )
+        return self.cache.get_or_load(
+            ('get_comments', case_id, limit),
+            lambda: [dict(row) for row in self._query('get_comments', query, job_config)][::-1],
+            tags=(('comments', case_id),)
+        )
+
+    def get_case_with_comments(self, case_id: str, limit: int = 50) -> Optional[dict]:
+        case = self.get_case_by_id(case_id)
+        if not case:
+            return None
+        return merge_comments(case, self.get_comments(case_id, limit))
 
     def create_track(self, track_name: str) -> dict:
         track_table = f'{self.project}.{self.dataset}.track'
+        # Generate the id here so the new row is known without reading it back
+        track = {'track_id': str(uuid.uuid4()), 'track_name': track_name}
         query = f"""
             INSERT INTO `{track_table}` (track_id, track_name)
-            VALUES (GENERATE_UUID(), @track_name)
+            VALUES (@track_id, @track_name)
         """
         job_config = bigquery.QueryJobConfig(
-            query_parameters=[bigquery.ScalarQueryParameter("track_name", "STRING", track_name)]
-        )
-        self.client.query(query, job_config=job_config).result()
-        # Fetch the newly created track
-        query = f"SELECT * FROM `{track_table}` WHERE track_name = @track_name ORDER BY track_id DESC LIMIT 1"
-        job_config = bigquery.QueryJobConfig(
-            query_parameters=[bigquery.ScalarQueryParameter("track_name", "STRING", track_name)]
+            query_parameters=[
+                bigquery.ScalarQueryParameter("track_id", "STRING", track['track_id']),
+                bigquery.ScalarQueryParameter("track_name", "STRING", track_name)
+            ]
         )
-        result = list(self.client.query(query, job_config=job_config).result())
-        return dict(result[0]) if result else {}
+        self._query('create_track', query, job_config)
+        self._invalidate('tracks')
+        return track
 
     def delete_track(self, track_id: str):
         track_table = f'{self.project}.{self.dataset}.track'
@@ -196,26 +559,82 @@ class Database:
         job_config = bigquery.QueryJobConfig(
             query_parameters=[bigquery.ScalarQueryParameter("track_id", "STRING", track_id)]
         )
-        self.client.query(query, job_config=job_config).result()
+        self._query('delete_track', query, job_config)
+        self._invalidate('tracks', ('track', track_id))
 
     def list_tracks(self) -> list:
         track_table = f'{self.project}.{self.dataset}.track'
         query = f"SELECT * FROM `{track_table}` ORDER BY track_id DESC"
-        return [dict(row) for row in self.client.query(query).result()]
+        return self.cache.get_or_load(
+            ('list_tracks',),
+            lambda: [dict(row) for row in self._query('list_tracks', query)],
+            tags=('tracks',)
+        )
 
     def assign_track_to_case(self, track_id: str, case_id: str):
+        self.track_map_writer.add({'case_id': case_id, 'track_id': track_id})
+
+    def assign_cases_to_track(self, track_id: str, case_ids: List[str]) -> int:
+        case_ids = list(dict.fromkeys(case_ids))
+        for start in range(0, len(case_ids), TRACK_BATCH_SIZE):
+            self._merge_track_mappings([
+                {'case_id': case_id, 'track_id': track_id}
+                for case_id in case_ids[start:start + TRACK_BATCH_SIZE]
+            ])
+        return len(case_ids)
+
+    def unassign_cases_from_track(self, track_id: str, case_ids: List[str]) -> int:
+        map_table = f'{self.project}.{self.dataset}.case_track_map'
+        case_ids = list(dict.fromkeys(case_ids))
+        query = f"DELETE FROM `{map_table}` WHERE track_id = @track_id AND case_id IN UNNEST(@case_ids)"
+        for start in range(0, len(case_ids), TRACK_BATCH_SIZE):
+            job_config = bigquery.QueryJobConfig(
+                query_parameters=[
+                    bigquery.ScalarQueryParameter("track_id", "STRING", track_id),
+                    bigquery.ArrayQueryParameter("case_ids", "STRING", case_ids[start:start + TRACK_BATCH_SIZE])
+                ]
+            )
+            self._query('unassign_cases_from_track', query, job_config)
+        self._invalidate(('track', track_id))
+        return len(case_ids)
+
+    def _write_track_mappings(self, rows: List[dict]) -> List[int]:
+        self._merge_track_mappings(rows)
+        return []
+
+    def _merge_track_mappings(self, rows: List[dict]):
+        # One MERGE per batch: idempotent for pairs that already exist, and
+        # unlike streaming inserts the rows stay editable by later DML.
+        if not rows:
+            return
         map_table = f'{self.project}.{self.dataset}.case_track_map'
         query = f"""
-            INSERT INTO `{map_table}` (case_id, track_id)
-            VALUES (@case_id, @track_id)
+            MERGE `{map_table}` T
+            USING (SELECT DISTINCT case_id, track_id FROM UNNEST(@rows)) S
+            ON T.case_id = S.case_id AND T.track_id = S.track_id
+            WHEN NOT MATCHED THEN
+                INSERT (case_id, track_id) VALUES (S.case_id, S.track_id)
         """
         job_config = bigquery.QueryJobConfig(
-            query_parameters=[
-                bigquery.ScalarQueryParameter("case_id", "STRING", case_id),
-                bigquery.ScalarQueryParameter("track_id", "STRING", track_id)
-            ]
+            query_parameters=[bigquery.ArrayQueryParameter("rows", "STRUCT", [
+                bigquery.StructQueryParameter(
+                    None,
+                    bigquery.ScalarQueryParameter("case_id", "STRING", row['case_id']),
+                    bigquery.ScalarQueryParameter("track_id", "STRING", row['track_id'])
+                )
+                for row in rows
+            ])]
         )
-        self.client.query(query, job_config=job_config).result()
+        self._query('assign_cases_to_track', query, job_config)
+        self._invalidate(*{('track', row['track_id']) for row in rows})
+
+    def flush(self):
+        self.similarity_writer.flush()
+        self.track_map_writer.flush()
+
+    def close(self):
+        self.similarity_writer.close()
+        self.track_map_writer.close()
 
     def get_cases_for_track(self, track_id: str) -> list:
         map_table = f'{self.project}.{self.dataset}.case_track_map'
@@ -223,4 +642,8 @@ class Database:
         job_config = bigquery.QueryJobConfig(
             query_parameters=[bigquery.ScalarQueryParameter("track_id", "STRING", track_id)]
         )
-        return [dict(row) for row in self.client.query(query, job_config=job_config).result()]
+        return self.cache.get_or_load(
+            ('get_cases_for_track', track_id),
+            lambda: [dict(row) for row in self._query('get_cases_for_track', query, job_config)],
+            tags=(('track', track_id),)
+        )
@@ -0,0 +1,97 @@
+import asyncio
+import json
+import threading
+import uuid
+from collections import deque
+from typing import AsyncIterator, List, Optional, Tuple
+from export import json_default
+
+# Columns a list view needs to render a new row without refetching
+CASE_SUMMARY_FIELDS = (
+    'case_id', 'customer_name', 'priority', 'type', 'product', 'status', 'geography', 'created_date'
+)
+
+def case_summary(case: dict) -> dict:
+    return {field: case.get(field) for field in CASE_SUMMARY_FIELDS}
+
+def format_event(event_id: str, event_type: str, data: dict) -> str:
+    return f"id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data, default=json_default)}\n\n"
+
+class EventBus:
+    # Events are kept in a bounded ring so reconnecting clients can resume from
+    # the last id they saw. Publishing is safe from any thread.
+    #
+    # Ids are "<epoch>-<n>": n counts per process, and the random epoch tells
+    # a cursor from this process apart from one issued by another worker or
+    # before a restart, which gets a reset instead of resuming at a bogus n.
+    def __init__(self, capacity: int = 1000):
+        self.epoch = uuid.uuid4().hex[:12]
+        self._lock = threading.Lock()
+        self._events: deque = deque(maxlen=capacity)
+        self._last_id = 0
+        self._waiters = set()
+
+    @property
+    def last_id(self) -> int:
+        return self._last_id
+
+    def event_id(self, sequence: int) -> str:
+        return f"{self.epoch}-{sequence}"
+
+    def parse_event_id(self, event_id: str) -> Optional[int]:
+        # Sequence number of an id from this process, else None
+        epoch, _, sequence = event_id.partition('-')
+        if epoch != self.epoch or not sequence.isdigit():
+            return None
+        return int(sequence)
+
+    def publish(self, event_type: str, data: dict) -> str:
+        with self._lock:
+            self._last_id += 1
+            sequence = self._last_id
+            self._events.append((sequence, event_type, data))
+            waiters = list(self._waiters)
+        for loop, wakeup in waiters:
+            loop.call_soon_threadsafe(wakeup.set)
+        return self.event_id(sequence)
+
+    def since(self, cursor: int) -> Tuple[List[tuple], bool]:
+        with self._lock:
+            oldest = self._events[0][0] if self._events else self._last_id + 1
+            # The client fell behind the ring (or holds an id past the end); it
+            # has to refetch before following deltas.
+            missed = cursor < oldest - 1 or cursor > self._last_id
+            return [event for event in self._events if event[0] > cursor], missed
+
+    async def stream(self, cursor: Optional[str] = None, heartbeat: float = 15.0) -> AsyncIterator[str]:
+        wakeup = asyncio.Event()
+        waiter = (asyncio.get_running_loop(), wakeup)
+        with self._lock:
+            self._waiters.add(waiter)
+            if cursor is None:
+                position = self._last_id
+            else:
+                # Another epoch (or garbage) sits before the ring and resets
+                position = self.parse_event_id(cursor)
+                if position is None:
+                    position = -1
+        try:
+            while True:
+                wakeup.clear()
+                events, missed = self.since(position)
+                if missed:
+                    position = self._last_id
+                    cursor = self.event_id(position)
+                    yield format_event(cursor, 'reset', {'cursor': cursor})
+                    continue
+                for sequence, event_type, data in events:
+                    position = sequence
+                    yield format_event(self.event_id(sequence), event_type, data)
+                if not events:
+                    try:
+                        await asyncio.wait_for(wakeup.wait(), heartbeat)
+                    except asyncio.TimeoutError:
+                        yield ": keep-alive\n\n"
+        finally:
+            with self._lock:
+                self._waiters.discard(waiter)
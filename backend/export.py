@@ -0,0 +1,38 @@
+import json
+import zlib
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any, Iterable, Iterator
+
+def json_default(value: Any) -> Any:
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, bytes):
+        return value.decode('utf-8', errors='replace')
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def ndjson_stream(rows: Iterable[dict], compress: bool = False, chunk_bytes: int = 64 * 1024) -> Iterator[bytes]:
+    # Buffer a few rows per chunk so the response isn't one tiny write per row
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    buffer = []
+    buffered = 0
+    for row in rows:
+        line = json.dumps(row, default=json_default).encode() + b'\n'
+        buffer.append(line)
+        buffered += len(line)
+        if buffered >= chunk_bytes:
+            chunk = b''.join(buffer)
+            buffer = []
+            buffered = 0
+            if compressor:
+                chunk = compressor.compress(chunk)
+            if chunk:
+                yield chunk
+
+    chunk = b''.join(buffer)
+    if compressor:
+        chunk = compressor.compress(chunk) + compressor.flush()
+    if chunk:
+        yield chunk
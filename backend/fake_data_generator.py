@@ -1,5 +1,6 @@
 from faker import Faker
 import random
+import uuid
 from datetime import datetime, timedelta
 
 fake = Faker()
@@ -36,10 +37,12 @@ ISSUE_TEMPLATES = [
     "User interface has display issues on {device}",
 ]
 
-def generate_case_id(index: int) -> str:
-    return f"CASE-{index:05d}"
+def generate_case_id() -> str:
+    # Random rather than sequential: workers can't see each other's inserts in
+    # time to number them, and a repeated id is dropped as a BigQuery insertId
+    return f"CASE-{uuid.uuid4().hex[:16].upper()}"
 
-def generate_fake_case(index: int) -> dict:
+def generate_fake_case() -> dict:
     priority = random.choices(
         PRIORITIES,
         weights=[30, 40, 20, 10],
@@ -82,7 +85,7 @@ def generate_fake_case(index: int) -> dict:
         snow_id = f"INC{random.randint(10000, 99999)}"
 
     return {
-        'case_id': generate_case_id(index),
+        'case_id': generate_case_id(),
         'customer_name': fake.company(),
         'description': description,
         'priority': priority,
@@ -95,5 +98,5 @@ def generate_fake_case(index: int) -> dict:
         'snow_id': snow_id
     }
 
-def generate_batch_cases(start_index: int, count: int) -> list:
-    return [generate_fake_case(start_index + i) for i in range(count)]
+def generate_batch_cases(count: int) -> list:
+    return [generate_fake_case() for _ in range(count)]
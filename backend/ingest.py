@@ -0,0 +1,199 @@
+import logging
+import queue
+import threading
+import time
+from typing import Callable, List, Optional, Sequence, Tuple
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# A handler takes one batch and returns the cases to pass downstream; an
+# empty result ends the batch's trip through the pipeline.
+Handler = Callable[[List[dict]], Optional[List[dict]]]
+
+class PartialFailure(Exception):
+    # Raised by a handler when only part of a batch went through: `done` still
+    # moves downstream and only `failed` is retried.
+    def __init__(self, message: str, done: List[dict], failed: List[dict]):
+        super().__init__(message)
+        self.done = done
+        self.failed = failed
+
+class Stage:
+    def __init__(self, name: str, handler: Handler, batch_size: int, queue_size: int, workers: int = 1,
+                 max_attempts: int = 3, retry_delay: float = 1.0):
+        self.name = name
+        self.handler = handler
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.queue: "queue.Queue[List[dict]]" = queue.Queue(maxsize=queue_size)
+        self.next: Optional["Stage"] = None
+        self.batches = 0
+        self.cases = 0
+        self.errors = 0
+        self.retried = 0
+        self.busy_seconds = 0.0
+        # Cases that still failed after max_attempts; kept until requeued, since
+        # the caller was already told they were accepted
+        self.dead_letters: List[dict] = []
+        self._lock = threading.Lock()
+        self._closed = False
+        self._threads = [
+            threading.Thread(target=self._run, name=f"ingest-{name}-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def _take(self) -> Tuple[List[dict], int]:
+        try:
+            batch = list(self.queue.get(timeout=0.5))
+        except queue.Empty:
+            return [], 0
+        taken = 1
+        # Coalesce whatever else is already waiting so small submissions still
+        # reach BigQuery and the index as full batches.
+        while len(batch) < self.batch_size:
+            try:
+                batch.extend(self.queue.get_nowait())
+            except queue.Empty:
+                break
+            taken += 1
+        return batch, taken
+
+    def _run(self):
+        while not self._closed:
+            batch, taken = self._take()
+            if not taken:
+                continue
+
+            output, elapsed = self._handle(batch)
+
+            with self._lock:
+                self.batches += 1
+                self.cases += len(batch)
+                self.busy_seconds += elapsed
+            metrics.INGEST_STAGE_SECONDS.labels(self.name).observe(elapsed)
+            metrics.INGEST_CASES.labels(self.name).inc(len(batch))
+
+            if output and self.next is not None:
+                # Blocks while the next stage is full, which in turn stops this
+                # stage from draining its own queue: backpressure all the way up.
+                self.next.queue.put(output)
+            for _ in range(taken):
+                self.queue.task_done()
+
+    def _handle(self, batch: List[dict]) -> Tuple[List[dict], float]:
+        # Retries whatever failed with exponential backoff, holding this worker
+        # meanwhile so a failing stage pushes back on the ones above it.
+        output, pending, elapsed = [], batch, 0.0
+        for attempt in range(1, self.max_attempts + 1):
+            started = time.perf_counter()
+            try:
+                done, pending = self.handler(pending) or [], []
+            except PartialFailure as e:
+                done, pending, error = e.done, e.failed, e
+            except Exception as e:
+                done, error = [], e
+            elapsed += time.perf_counter() - started
+            output.extend(done)
+            if not pending:
+                break
+
+            with self._lock:
+                self.errors += 1
+            logger.error(f"ingest {self.name}: {len(pending)} of {len(batch)} cases failed "
+                         f"(attempt {attempt}/{self.max_attempts}): {error}")
+            if attempt < self.max_attempts:
+                with self._lock:
+                    self.retried += len(pending)
+                time.sleep(self.retry_delay * 2 ** (attempt - 1))
+
+        if pending:
+            with self._lock:
+                self.dead_letters.extend(pending)
+            metrics.INGEST_DEAD_LETTERS.labels(self.name).inc(len(pending))
+        return output, elapsed
+
+    def requeue_dead_letters(self) -> int:
+        with self._lock:
+            cases, self.dead_letters = self.dead_letters, []
+        for start in range(0, len(cases), self.batch_size):
+            self.queue.put(cases[start:start + self.batch_size])
+        return len(cases)
+
+    def join(self):
+        self.queue.join()
+
+    def close(self):
+        self._closed = True
+        for thread in self._threads:
+            thread.join(timeout=1)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'stage': self.name,
+                'queued_batches': self.queue.qsize(),
+                'batches': self.batches,
+                'cases': self.cases,
+                'errors': self.errors,
+                'retried': self.retried,
+                'dead_letters': len(self.dead_letters),
+                'busy_seconds': round(self.busy_seconds, 3),
+                'cases_per_second': self.cases / self.busy_seconds if self.busy_seconds else 0.0
+            }
+
+class IngestPipeline:
+    # stages are (name, handler, workers) in order; each gets a bounded queue
+    # of queue_size batches in front of it.
+    def __init__(self, stages: Sequence[Tuple[str, Handler, int]], batch_size: int = 500, queue_size: int = 8):
+        self.batch_size = batch_size
+        self.stages = [
+            Stage(name, handler, batch_size, queue_size, workers)
+            for name, handler, workers in stages
+        ]
+        for stage, downstream in zip(self.stages, self.stages[1:]):
+            stage.next = downstream
+        self._admission = threading.Lock()
+
+    def submit(self, cases: List[dict], timeout: Optional[float] = None) -> int:
+        # All or nothing: a submission is only queued once the first stage has
+        # room for every one of its batches, so a rejected caller can retry
+        # without any part of it already in flight. Raises queue.Full if that
+        # room doesn't appear within timeout; with timeout=None it waits.
+        head = self.stages[0].queue
+        batches = [cases[start:start + self.batch_size] for start in range(0, len(cases), self.batch_size)]
+        if len(batches) > head.maxsize:
+            raise ValueError(f"Submission of {len(cases)} cases exceeds the ingest queue "
+                             f"({head.maxsize * self.batch_size} cases)")
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._admission:
+            # Workers only ever take from the queue, so free space can only grow
+            # while this lock keeps other submitters out
+            while head.maxsize - head.qsize() < len(batches):
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise queue.Full
+                time.sleep(0.05)
+            for batch in batches:
+                head.put_nowait(batch)
+        return len(cases)
+
+    def flush(self):
+        # Stages mark a batch done only after handing it downstream, so
+        # joining them in order drains the whole pipeline.
+        for stage in self.stages:
+            stage.join()
+
+    def close(self):
+        self.flush()
+        for stage in self.stages:
+            stage.close()
+
+    def requeue_dead_letters(self) -> int:
+        # Sends dead-lettered cases back through the stage they failed in
+        return sum(stage.requeue_dead_letters() for stage in self.stages)
+
+    def stats(self) -> List[dict]:
+        return [stage.stats() for stage in self.stages]
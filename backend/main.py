@@ -1,12 +1,26 @@
 from fastapi import FastAPI, HTTPException, Query, Request, Body
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
+from starlette.routing import Match
 from typing import Optional, List
 from pydantic import BaseModel
-from database import Database
+from async_database import AsyncDatabase
+from database import BatchInsertError, Database, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, encode_cursor, merge_comments
+from export import ndjson_stream
+from ingest import IngestPipeline, PartialFailure
 from ml_model import CaseClassifier, SimilarityDetector
-from fake_data_generator import generate_batch_cases
+from responses import json_response
+from fake_data_generator import generate_batch_cases, generate_case_id
 from apscheduler.schedulers.background import BackgroundScheduler
+from prometheus_client import CONTENT_TYPE_LATEST
+from datetime import datetime
+import asyncio
 import logging
+import metrics
+import os
+import queue
+import threading
+import time
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -21,9 +35,29 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    # Label by route template, not raw path, to keep label cardinality bounded
+    route = "unmatched"
+    for candidate in request.app.routes:
+        match, _ = candidate.matches(request.scope)
+        if match == Match.FULL:
+            route = candidate.path
+            break
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        metrics.HTTP_REQUEST_SECONDS.labels(request.method, route, str(status)).observe(time.perf_counter() - started)
+
 db = Database()
+adb = AsyncDatabase(db)
 classifier = CaseClassifier()
 similarity_detector = SimilarityDetector()
+SIMILARITY_SNAPSHOT_DIR = os.getenv('SIMILARITY_SNAPSHOT_DIR', 'similarity_snapshot')
 
 class CaseCreate(BaseModel):
     customer_name: str
@@ -33,6 +67,10 @@ class CaseCreate(BaseModel):
     status: Optional[str] = "Open"
     geography: Optional[str] = "North America"
 
+class IngestCase(CaseCreate):
+    case_id: str
+    created_date: Optional[str] = None
+
 class DashboardStats(BaseModel):
     total_cases: int
     high_priority: int
@@ -42,50 +80,138 @@ class DashboardStats(BaseModel):
 class TrackCreate(BaseModel):
     track_name: str
 
-def classify_and_process_case(case_data: dict) -> dict:
-    case_type = classifier.classify_type(case_data['description'])
-    module, sub_module = classifier.classify_module(case_data['description'])
-    category = classifier.assign_category(case_type, case_data['priority'])
+class TrackCases(BaseModel):
+    case_ids: List[str]
 
-    case_data['type'] = case_type
-    case_data['module'] = module
-    case_data['sub_module'] = sub_module
-    case_data['category'] = category
+def classify_and_process_cases(cases: List[dict]) -> List[dict]:
+    classifications = classifier.classify_batch(
+        [case['description'] for case in cases],
+        [case.get('priority') for case in cases]
+    )
+    for case_data, classification in zip(cases, classifications):
+        case_data.update(classification)
 
-    return case_data
+    return cases
 
-def compute_similarities_for_case(case_id: str, case_description: str):
+def classify_and_process_case(case_data: dict) -> dict:
+    return classify_and_process_cases([case_data])[0]
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    if not fields:
+        return None
+    return [field.strip() for field in fields.split(",") if field.strip()]
+
+def case_page(cases: List[dict], limit: int) -> dict:
+    next_cursor = encode_cursor(cases[-1]) if len(cases) == limit else None
+    return {"cases": cases, "count": len(cases), "next_cursor": next_cursor}
+
+def database_error(e: Exception) -> HTTPException:
+    if isinstance(e, asyncio.TimeoutError):
+        return HTTPException(status_code=504, detail="Database request timed out")
+    return HTTPException(status_code=500, detail=str(e))
+
+async def fetch_related_cases(case: dict) -> List[dict]:
+    # similar_case_url holds a comma-separated list of related case ids
+    url = case.get("similar_case_url") or ""
+    related_ids = [related_id.strip() for related_id in url.split(",") if related_id.strip()]
+    return await adb.get_cases_by_ids(related_ids)
+
+# One refit at a time per worker; a trigger that finds one running skips
+similarity_refit_lock = threading.Lock()
+
+def refresh_similarity_index(force: bool = False):
+    if not similarity_refit_lock.acquire(blocking=False):
+        return
     try:
-        all_cases = db.get_all_cases()
-        if len(all_cases) > 1:
+        if force or similarity_detector.needs_refit():
+            all_cases = list(db.iter_cases(fields=['description'], page_size=10000))
             similarity_detector.fit(all_cases)
-            similar_cases = similarity_detector.find_similar(case_description, case_id, top_k=3)
+            similarity_detector.save(SIMILARITY_SNAPSHOT_DIR)
+            logger.info(f"Refitted similarity index on {len(all_cases)} cases")
+    except Exception as e:
+        logger.error(f"Error refitting similarity index: {e}")
+    finally:
+        similarity_refit_lock.release()
+
+def load_similarity_index():
+    try:
+        if not similarity_detector.load(SIMILARITY_SNAPSHOT_DIR):
+            refresh_similarity_index()
+            return
+
+        if similarity_detector.watermark is not None:
+            new_cases = db.get_cases_created_after(similarity_detector.watermark)
+            similarity_detector.add(new_cases)
+            logger.info(f"Loaded similarity snapshot and caught up on {len(new_cases)} cases")
+
+        # Cases inserted with a created_date behind the watermark are invisible
+        # to the catch-up query; fall back to a full refit if any are missing.
+        if len(similarity_detector) != db.get_distinct_case_count():
+            refresh_similarity_index(force=True)
+    except Exception as e:
+        logger.error(f"Error loading similarity index: {e}")
 
-            db.delete_similarities_for_case(case_id)
+def build_search_index():
+    try:
+        db.build_search_index()
+        logger.info(f"Search index built over {len(db.search_index)} cases")
+    except Exception as e:
+        logger.error(f"Error building search index: {e}")
 
-            for related_id, score in similar_cases:
-                if score > 0.1:
-                    db.insert_similarity(case_id, related_id, score)
+def reconcile_dashboard_stats():
+    try:
+        db.reconcile_dashboard_stats()
+    except Exception as e:
+        logger.error(f"Error reconciling dashboard stats: {e}")
+
+def index_cases(cases: List[dict]) -> List[dict]:
+    if similarity_detector.is_fitted:
+        similarity_detector.add(cases)
+    # A refit reads the whole table, so it never runs on the request or ingest
+    # path; growth or drift starts one in the background instead of waiting
+    # for the scheduled check.
+    if similarity_detector.needs_refit() and not similarity_refit_lock.locked():
+        threading.Thread(target=refresh_similarity_index, name="similarity-refit", daemon=True).start()
+    return cases
+
+def write_similarity_edges(cases: List[dict]):
+    case_ids = [case['case_id'] for case in cases]
+    db.delete_similarities_for_cases(case_ids)
+
+    neighbours = similarity_detector.find_similar_batch(case_ids, top_k=3, min_score=0.1)
+    for case_id, similar_cases in neighbours.items():
+        for related_id, score in similar_cases:
+            db.insert_similarity(case_id, related_id, score)
+
+def compute_similarities_for_cases(cases: List[dict]):
+    try:
+        write_similarity_edges(index_cases(cases))
     except Exception as e:
         logger.error(f"Error computing similarities: {e}")
 
+def persist_cases(cases: List[dict]) -> List[dict]:
+    # Rows that did land still go on to be indexed while the rest are retried
+    try:
+        return db.insert_cases_batch(cases)
+    except BatchInsertError as e:
+        raise PartialFailure(str(e), e.inserted, e.failed)
+
+# classify -> persist -> index -> similarity edges, with bounded queues between
+# stages. Persisting is BigQuery-bound so it gets several workers; the index
+# stages share the detector's lock and run one worker each.
+ingest = IngestPipeline([
+    ('classify', classify_and_process_cases, 1),
+    ('persist', persist_cases, 4),
+    ('index', index_cases, 1),
+    ('similarity', write_similarity_edges, 1)
+], batch_size=500, queue_size=8)
+
 def generate_and_insert_cases():
     try:
         logger.info("Generating new fake cases...")
-        current_count = db.get_case_count()
-        new_cases = generate_batch_cases(current_count + 1, 5)
-
-        processed_cases = []
-        for case in new_cases:
-            processed_case = classify_and_process_case(case)
-            processed_cases.append(processed_case)
-
-        inserted_cases = db.insert_cases_batch(processed_cases)
-        logger.info(f"Inserted {len(inserted_cases)} new cases")
-
-        for case in inserted_cases:
-            compute_similarities_for_case(case['id'], case['description'])
-
+        new_cases = generate_batch_cases(5)
+        ingest.submit(new_cases)
+        logger.info(f"Queued {len(new_cases)} new cases for ingest")
     except Exception as e:
         logger.error(f"Error generating cases: {e}")
 
@@ -97,12 +223,9 @@ async def startup_event():
         case_count = db.get_case_count()
         if case_count == 0:
             logger.info("Initializing database with 500 fake cases...")
-            initial_cases = generate_batch_cases(1, 500)
+            initial_cases = generate_batch_cases(500)
 
-            processed_cases = []
-            for case in initial_cases:
-                processed_case = classify_and_process_case(case)
-                processed_cases.append(processed_case)
+            processed_cases = classify_and_process_cases(initial_cases)
 
             batch_size = 100
             for i in range(0, len(processed_cases), batch_size):
@@ -111,129 +234,240 @@ async def startup_event():
                 logger.info(f"Inserted batch {i//batch_size + 1}")
 
             logger.info("Computing similarities...")
-            all_cases = db.get_all_cases()
+            all_cases = list(db.iter_cases(fields=['description'], page_size=10000))
             if all_cases:
                 similarity_detector.fit(all_cases)
-                for case in all_cases[:100]:
-                    similar_cases = similarity_detector.find_similar(case['description'], case['id'], top_k=3)
+                similarity_detector.save(SIMILARITY_SNAPSHOT_DIR)
+                neighbours = similarity_detector.top_k_all(top_k=3, min_score=0.1, n_jobs=-1)
+                for case_id, similar_cases in neighbours.items():
                     for related_id, score in similar_cases:
-                        if score > 0.1:
-                            db.insert_similarity(case['id'], related_id, score)
+                        db.insert_similarity(case_id, related_id, score)
+                db.flush()
 
             logger.info("Database initialized successfully")
+        else:
+            load_similarity_index()
     except Exception as e:
         logger.error(f"Error during startup: {e}")
 
     scheduler = BackgroundScheduler()
     scheduler.add_job(generate_and_insert_cases, 'interval', minutes=10)
+    scheduler.add_job(refresh_similarity_index, 'interval', minutes=30)
+    scheduler.add_job(reconcile_dashboard_stats, 'interval', minutes=60)
+    # Search falls back to LIKE until the first build is ready; later runs pick
+    # up rows written by other workers and the agent pipeline
+    scheduler.add_job(build_search_index, 'interval', minutes=60, next_run_time=datetime.now())
     scheduler.start()
     logger.info("Scheduled job for generating cases every 10 minutes")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    logger.info("Flushing buffered writes...")
+    ingest.close()
+    db.close()
+    adb.close()
+
 @app.get("/")
 async def root():
     return {"message": "Project Canary API", "status": "running"}
 
 @app.get("/api/stats", response_model=DashboardStats)
-async def get_dashboard_stats():
+async def get_dashboard_stats(request: Request):
     try:
-        stats = db.get_dashboard_stats()
-        return stats
+        stats = await adb.get_dashboard_stats()
+        return json_response(request, stats, conditional=True)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise database_error(e)
+
+@app.get("/metrics")
+async def get_metrics():
+    return Response(metrics.render(), media_type=CONTENT_TYPE_LATEST)
+
+@app.post("/api/ingest", status_code=202)
+async def ingest_cases(cases: List[IngestCase]):
+    rows = []
+    for case in cases:
+        row = case.dict()
+        row['created_date'] = row['created_date'] or datetime.now().isoformat()
+        rows.append(row)
+    try:
+        # Wait briefly for queue space, then push back on the caller
+        queued = await asyncio.to_thread(ingest.submit, rows, 5)
+    except queue.Full:
+        raise HTTPException(status_code=503, detail="Ingest pipeline is full", headers={"Retry-After": "5"})
+    except ValueError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    return {"queued": queued}
+
+@app.get("/api/ingest/stats")
+async def get_ingest_stats():
+    return {"stages": ingest.stats()}
+
+@app.post("/api/ingest/retry")
+async def retry_ingest_dead_letters():
+    # Blocks on queue space like any other submission
+    requeued = await asyncio.to_thread(ingest.requeue_dead_letters)
+    return {"requeued": requeued}
+
+@app.get("/api/cache/stats")
+async def get_cache_stats():
+    return db.cache.stats()
 
 @app.get("/api/cases")
 async def get_cases(
+    request: Request,
     customer_name: Optional[str] = Query(None),
     case_id: Optional[str] = Query(None),
     product: Optional[str] = Query(None),
     priority: Optional[str] = Query(None),
     type: Optional[str] = Query(None),
-    status: Optional[str] = Query(None)
+    status: Optional[str] = Query(None),
+    fields: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)
 ):
     try:
+        page = dict(fields=parse_fields(fields), cursor=cursor, limit=limit)
         if status:
-            cases = db.get_cases_by_status(status)
+            cases = await adb.get_cases_by_status(status, **page)
         elif any([customer_name, case_id, product, priority, type]):
-            cases = db.search_cases(customer_name, case_id, product, priority, type)
+            cases = await adb.search_cases(customer_name, case_id, product, priority, type, **page)
         else:
-            cases = db.get_all_cases()
+            cases = await adb.get_all_cases(**page)
 
-        return {"cases": cases, "count": len(cases)}
+        return json_response(request, case_page(cases, limit), conditional=True)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise database_error(e)
 
 @app.get("/api/cases/high-priority")
-async def get_high_priority_cases():
+async def get_high_priority_cases(
+    request: Request,
+    fields: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)
+):
     try:
-        high = db.get_cases_by_priority('High')
-        critical = db.get_cases_by_priority('Critical')
-        cases = critical + high
-        return {"cases": cases, "count": len(cases)}
+        cases = await adb.get_cases_by_priorities(
+            ['Critical', 'High'], fields=parse_fields(fields), cursor=cursor, limit=limit
+        )
+        return json_response(request, case_page(cases, limit), conditional=True)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise database_error(e)
 
 @app.get("/api/cases/incidents")
-async def get_incidents():
+async def get_incidents(
+    request: Request,
+    fields: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)
+):
     try:
-        cases = db.get_cases_by_type('Incident')
-        return {"cases": cases, "count": len(cases)}
+        cases = await adb.get_cases_by_type('Incident', fields=parse_fields(fields), cursor=cursor, limit=limit)
+        return json_response(request, case_page(cases, limit), conditional=True)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise database_error(e)
 
 @app.get("/api/cases/open")
-async def get_open_cases():
+async def get_open_cases(
+    request: Request,
+    fields: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)
+):
     try:
-        cases = db.get_cases_by_status('Open')
-        return {"cases": cases, "count": len(cases)}
+        cases = await adb.get_cases_by_status('Open', fields=parse_fields(fields), cursor=cursor, limit=limit)
+        return json_response(request, case_page(cases, limit), conditional=True)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise database_error(e)
+
+@app.get("/api/events")
+async def stream_events(request: Request, cursor: Optional[str] = Query(None)):
+    # EventSource resends the last id it saw in Last-Event-ID on reconnect
+    if cursor is None:
+        cursor = request.headers.get("last-event-id") or None
+    return StreamingResponse(
+        db.events.stream(cursor),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/api/search/suggest")
+async def suggest_cases(q: str = Query(..., min_length=1), limit: int = Query(10, ge=1, le=50)):
+    return {
+        "suggestions": await asyncio.to_thread(db.search_index.suggest, q, limit),
+        "ready": db.search_index.ready
+    }
+
+@app.get("/api/cases/export")
+async def export_cases(
+    fields: Optional[str] = Query(None),
+    status: Optional[str] = Query(None),
+    priority: Optional[str] = Query(None),
+    type: Optional[str] = Query(None),
+    product: Optional[str] = Query(None),
+    gzip: bool = Query(False)
+):
+    try:
+        rows = db.iter_cases(parse_fields(fields), status, priority, type, product)
+        # Pull the first row eagerly so query errors surface as a status code
+        # instead of a truncated stream.
+        first = await adb.run(next, rows, None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise database_error(e)
+
+    def all_rows():
+        if first is not None:
+            yield first
+            yield from rows
+
+    filename = "cases.ndjson.gz" if gzip else "cases.ndjson"
+    return StreamingResponse(
+        ndjson_stream(all_rows(), compress=gzip),
+        media_type="application/gzip" if gzip else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
 
 @app.get("/api/cases/{case_id}")
-async def get_case(case_id: str):
+async def get_case(case_id: str, request: Request):
     try:
-        case = db.get_case_by_id(case_id)
+        case = await adb.get_case_by_id(case_id)
         if not case:
             raise HTTPException(status_code=404, detail="Case not found")
-        similar_cases = db.get_similar_cases(case_id, limit=3)
-        # Fetch details for each similar_case_url (support multiple IDs)
-        related_cases = []
-        for item in similar_cases:
-            url = item.get("similar_case_url")
-            if url:
-                for related_id in url.split(","):
-                    related_id = related_id.strip()
-                    if related_id:
-                        related_case = db.get_case_by_id(related_id)
-                        if related_case:
-                            related_cases.append(related_case)
+        related_cases, comments = await adb.gather(
+            fetch_related_cases(case),
+            adb.get_comments(case_id)
+        )
+        case = merge_comments(case, comments)
         case['related_cases'] = related_cases
-        return case
+        return json_response(request, case, conditional=True)
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise database_error(e)
 
 @app.get("/api/cases/{case_id}/similar")
-async def get_similar_cases(case_id: str):
+async def get_similar_cases(case_id: str, request: Request):
     try:
-        case = db.get_case_by_id(case_id)
+        case = await adb.get_case_by_id(case_id)
         if not case:
             raise HTTPException(status_code=404, detail="Case not found")
-        similar_cases = db.get_similar_cases(case_id, limit=3)
-        # Fetch details for each similar_case_url (support multiple IDs)
-        related_cases = []
-        for item in similar_cases:
-            url = item.get("similar_case_url")
-            if url:
-                for related_id in url.split(","):
-                    related_id = related_id.strip()
-                    if related_id:
-                        related_case = db.get_case_by_id(related_id)
-                        if related_case:
-                            related_cases.append(related_case)
-        return {"similar_cases": related_cases, "count": len(related_cases)}
+        related_cases = await fetch_related_cases(case)
+        return json_response(request, {"similar_cases": related_cases, "count": len(related_cases)},
+                             conditional=True)
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise database_error(e)
 
 @app.post("/api/cases")
 async def create_case(case: CaseCreate):
@@ -241,27 +475,28 @@ async def create_case(case: CaseCreate):
         case_dict = case.dict()
         processed_case = classify_and_process_case(case_dict)
 
-        current_count = db.get_case_count()
-        processed_case['case_id'] = f"CASE-{current_count + 1:05d}"
+        processed_case['case_id'] = generate_case_id()
 
-        inserted_case = db.insert_case(processed_case)
+        await adb.insert_case(processed_case)
 
-        compute_similarities_for_case(inserted_case['id'], inserted_case['description'])
+        await adb.run(compute_similarities_for_cases, [processed_case])
 
-        return inserted_case
+        return processed_case
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise database_error(e)
 
 @app.put("/api/cases/{case_id}")
 async def update_case(case_id: str, request: Request):
     try:
         updates = await request.json()
-        updated_case = db.update_case_by_id(case_id, updates)
+        updated_case = await adb.update_case_by_id(case_id, updates)
         if not updated_case:
             raise HTTPException(status_code=404, detail="Case not found or no fields to update")
         return updated_case
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise database_error(e)
 
 @app.post("/api/cases/{case_id}/comment")
 async def add_comment(case_id: str, body: dict = Body(...)):
@@ -269,21 +504,43 @@ async def add_comment(case_id: str, body: dict = Body(...)):
         comment = body.get("comment")
         if not comment:
             raise HTTPException(status_code=400, detail="Comment is required")
-        updated_case = db.add_comment_to_case(case_id, comment)
+        updated_case = await adb.add_comment_to_case(case_id, comment)
         if not updated_case:
             raise HTTPException(status_code=404, detail="Case not found")
         return updated_case
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise database_error(e)
+
+@app.get("/api/facets")
+async def get_facets(
+    request: Request,
+    product: Optional[str] = Query(None),
+    priority: Optional[str] = Query(None),
+    type: Optional[str] = Query(None),
+    status: Optional[str] = Query(None),
+    geography: Optional[str] = Query(None)
+):
+    try:
+        facets = await adb.get_facets({
+            "product": product,
+            "priority": priority,
+            "type": type,
+            "status": status,
+            "geography": geography
+        })
+        return json_response(request, facets, conditional=True)
+    except Exception as e:
+        raise database_error(e)
 
 @app.get("/api/products")
 async def get_products():
     try:
-        all_cases = db.get_all_cases()
-        products = list(set(case['product'] for case in all_cases))
-        return {"products": sorted(products)}
+        facets = await adb.get_facets()
+        return {"products": [item["value"] for item in facets["product"]]}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise database_error(e)
 
 @app.get("/api/types")
 async def get_types():
@@ -296,49 +553,66 @@ async def get_priorities():
 @app.post("/api/tracks")
 async def create_track(track: TrackCreate):
     try:
-        new_track = db.create_track(track.track_name)
+        new_track = await adb.create_track(track.track_name)
         return new_track
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise database_error(e)
 
 @app.delete("/api/tracks/{track_id}")
 async def delete_track(track_id: str):
     try:
-        db.delete_track(track_id)
+        await adb.delete_track(track_id)
         return {"message": "Track deleted"}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise database_error(e)
 
 @app.get("/api/tracks")
 async def list_tracks():
     try:
-        tracks = db.list_tracks()
+        tracks = await adb.list_tracks()
         return tracks
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise database_error(e)
 
 @app.post("/api/tracks/{track_id}/assign-random")
 async def assign_track_random(track_id: str):
     try:
-        cases = db.get_all_cases()
+        cases = await adb.get_all_cases(fields=['case_id'])
         import random
         if not cases:
             raise HTTPException(status_code=404, detail="No cases available")
         # Assign to 5 random cases for testing
         selected_cases = random.sample(cases, min(5, len(cases)))
-        for case in selected_cases:
-            db.assign_track_to_case(track_id, case['case_id'])
+        await adb.assign_cases_to_track(track_id, [case['case_id'] for case in selected_cases])
         return {"assigned_case_ids": [case['case_id'] for case in selected_cases]}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise database_error(e)
+
+@app.post("/api/tracks/{track_id}/cases")
+async def assign_cases_to_track(track_id: str, body: TrackCases):
+    try:
+        assigned = await adb.assign_cases_to_track(track_id, body.case_ids)
+        return {"track_id": track_id, "assigned": assigned}
+    except Exception as e:
+        raise database_error(e)
+
+@app.delete("/api/tracks/{track_id}/cases")
+async def unassign_cases_from_track(track_id: str, body: TrackCases):
+    try:
+        unassigned = await adb.unassign_cases_from_track(track_id, body.case_ids)
+        return {"track_id": track_id, "unassigned": unassigned}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise database_error(e)
 
 @app.get("/api/tracks/{track_id}/cases")
 async def get_cases_for_track(track_id: str):
     try:
-        case_maps = db.get_cases_for_track(track_id)
+        case_maps = await adb.get_cases_for_track(track_id)
         return case_maps
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise database_error(e)
 
 if __name__ == "__main__":
     import uvicorn
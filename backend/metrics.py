@@ -0,0 +1,65 @@
+import time
+from prometheus_client import Counter, Histogram, generate_latest
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+BYTES_BUCKETS = tuple(10 ** exponent for exponent in range(3, 13))
+SLOT_MS_BUCKETS = tuple(10 ** exponent for exponent in range(1, 9))
+
+QUERY_SECONDS = Histogram(
+    'canary_bigquery_query_seconds', 'BigQuery call latency by Database method',
+    ['method'], buckets=LATENCY_BUCKETS
+)
+QUERY_BYTES_PROCESSED = Histogram(
+    'canary_bigquery_bytes_processed', 'Bytes processed per BigQuery job by Database method',
+    ['method'], buckets=BYTES_BUCKETS
+)
+QUERY_SLOT_MS = Histogram(
+    'canary_bigquery_slot_milliseconds', 'Slot milliseconds per BigQuery job by Database method',
+    ['method'], buckets=SLOT_MS_BUCKETS
+)
+QUERY_CACHE_HITS = Counter(
+    'canary_bigquery_cache_hits_total', 'BigQuery jobs answered from the BigQuery result cache',
+    ['method']
+)
+QUERY_ERRORS = Counter(
+    'canary_bigquery_errors_total', 'Failed BigQuery calls by Database method',
+    ['method']
+)
+ROWS_INSERTED = Counter(
+    'canary_bigquery_rows_inserted_total', 'Rows sent through streaming inserts by Database method',
+    ['method']
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    'canary_http_request_seconds', 'HTTP request latency by route',
+    ['method', 'route', 'status'], buckets=LATENCY_BUCKETS
+)
+INGEST_STAGE_SECONDS = Histogram(
+    'canary_ingest_stage_seconds', 'Time spent handling one batch by ingest pipeline stage',
+    ['stage'], buckets=LATENCY_BUCKETS
+)
+INGEST_CASES = Counter(
+    'canary_ingest_cases_total', 'Cases handled by ingest pipeline stage',
+    ['stage']
+)
+INGEST_DEAD_LETTERS = Counter(
+    'canary_ingest_dead_letters_total', 'Cases dead-lettered after exhausting retries, by ingest pipeline stage',
+    ['stage']
+)
+
+def observe_query(method: str, started: float, job=None):
+    QUERY_SECONDS.labels(method).observe(time.perf_counter() - started)
+    if job is None:
+        return
+    if job.total_bytes_processed is not None:
+        QUERY_BYTES_PROCESSED.labels(method).observe(job.total_bytes_processed)
+    if job.slot_millis is not None:
+        QUERY_SLOT_MS.labels(method).observe(job.slot_millis)
+    if job.cache_hit:
+        QUERY_CACHE_HITS.labels(method).inc()
+
+def observe_error(method: str, started: float):
+    QUERY_SECONDS.labels(method).observe(time.perf_counter() - started)
+    QUERY_ERRORS.labels(method).inc()
+
+def render() -> bytes:
+    return generate_latest()
@@ -1,8 +1,48 @@
+import fcntl
+import json
+import os
 import re
-from typing import List, Tuple
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from joblib import Parallel, delayed, effective_n_jobs
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
+import scipy.sparse as sp
+
+class KeywordMatcher:
+    def __init__(self, tables: Dict[str, Dict[str, List[str]]]):
+        self.tables = {name: list(table) for name, table in tables.items()}
+        self.keyword_labels: Dict[str, List[Tuple[str, str]]] = {}
+        for name, table in tables.items():
+            for label, keywords in table.items():
+                for keyword in keywords:
+                    self.keyword_labels.setdefault(keyword, []).append((name, label))
+
+        # A zero-width lookahead reports a match at every position. Trying the
+        # longest keywords first means the match at a position implies every
+        # shorter keyword that is a prefix of it, which keeps the scores equal
+        # to independent substring tests.
+        keywords = sorted(self.keyword_labels, key=len, reverse=True)
+        self.pattern = re.compile('(?=(' + '|'.join(re.escape(keyword) for keyword in keywords) + '))')
+        self.implied = {
+            keyword: [other for other in keywords if keyword.startswith(other)]
+            for keyword in keywords
+        }
+
+    def score(self, text: str) -> Dict[str, Dict[str, int]]:
+        found = set()
+        for match in self.pattern.finditer(text.lower()):
+            found.update(self.implied[match.group(1)])
+
+        scores = {name: dict.fromkeys(labels, 0) for name, labels in self.tables.items()}
+        for keyword in found:
+            for name, label in self.keyword_labels[keyword]:
+                scores[name][label] += 1
+        return scores
 
 class CaseClassifier:
     def __init__(self):
@@ -24,27 +64,17 @@ class CaseClassifier:
             'Security': ['security', 'vulnerability', 'breach', 'encryption', 'ssl', 'https']
         }
 
-    def classify_type(self, description: str) -> str:
-        description_lower = description.lower()
-        scores = {}
-
-        for case_type, keywords in self.type_keywords.items():
-            score = sum(1 for keyword in keywords if keyword in description_lower)
-            scores[case_type] = score
+        self.matcher = KeywordMatcher({'type': self.type_keywords, 'module': self.module_keywords})
 
+    @staticmethod
+    def _pick_type(scores: Dict[str, int]) -> str:
         if max(scores.values()) == 0:
             return 'Inquiry'
 
         return max(scores, key=scores.get)
 
-    def classify_module(self, description: str) -> Tuple[str, str]:
-        description_lower = description.lower()
-        scores = {}
-
-        for module, keywords in self.module_keywords.items():
-            score = sum(1 for keyword in keywords if keyword in description_lower)
-            scores[module] = score
-
+    @staticmethod
+    def _pick_module(scores: Dict[str, int]) -> Tuple[str, str]:
         if max(scores.values()) == 0:
             module = 'General'
             sub_module = 'Other'
@@ -54,6 +84,29 @@ class CaseClassifier:
 
         return module, sub_module
 
+    def classify_type(self, description: str) -> str:
+        return self._pick_type(self.matcher.score(description)['type'])
+
+    def classify_module(self, description: str) -> Tuple[str, str]:
+        return self._pick_module(self.matcher.score(description)['module'])
+
+    def classify_batch(self, descriptions: List[str], priorities: Optional[List[str]] = None) -> List[dict]:
+        if priorities is None:
+            priorities = [None] * len(descriptions)
+
+        results = []
+        for description, priority in zip(descriptions, priorities):
+            scores = self.matcher.score(description or '')
+            case_type = self._pick_type(scores['type'])
+            module, sub_module = self._pick_module(scores['module'])
+            results.append({
+                'type': case_type,
+                'module': module,
+                'sub_module': sub_module,
+                'category': self.assign_category(case_type, priority)
+            })
+        return results
+
     def assign_category(self, case_type: str, priority: str) -> str:
         if priority == 'Critical':
             return 'P0 - Critical'
@@ -66,38 +119,400 @@ class CaseClassifier:
         else:
             return 'P3 - Standard'
 
+def _gather_rows(parts: list, rows: np.ndarray) -> sp.csr_matrix:
+    # rows are sorted global row numbers across the stacked parts
+    blocks = []
+    offset = 0
+    for part in parts:
+        in_part = rows[(rows >= offset) & (rows < offset + part.shape[0])]
+        if len(in_part):
+            blocks.append(part[in_part - offset])
+        offset += part.shape[0]
+    return sp.vstack(blocks, format='csr') if len(blocks) > 1 else blocks[0]
+
+def _top_k_block(block, parts: list, rows: np.ndarray, inactive: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+    # rows[i] is the global row of block row i, masked out so a case is never
+    # its own neighbour; removed rows are masked the same way.
+    scores = np.hstack([(block @ part.T).toarray() for part in parts])
+    scores[:, inactive] = -1.0
+    scores[np.arange(block.shape[0]), rows] = -1.0
+
+    indices = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+    top_scores = np.take_along_axis(scores, indices, axis=1)
+    order = np.argsort(-top_scores, axis=1)
+    return np.take_along_axis(indices, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+def _snapshot_ns(name: str) -> int:
+    try:
+        return int(name[len('snapshot-'):])
+    except ValueError:
+        return -1
+
+def _as_timestamp(value) -> Optional[datetime]:
+    if value is None:
+        return None
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace(' UTC', '+00:00'))
+        except ValueError:
+            return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
 class SimilarityDetector:
-    def __init__(self):
-        self.vectorizer = TfidfVectorizer(
+    SNAPSHOT_VERSION = 1
+
+    def __init__(self, refit_interval: float = 3600, max_growth: float = 0.5,
+                 max_drift: float = 0.3, min_drift_samples: int = 50):
+        self.vectorizer = self._new_vectorizer()
+        self.case_vectors = None
+        self.case_ids = []
+        self.watermark: Optional[datetime] = None
+        # Refit policy: on a schedule, when the index has grown past the corpus
+        # the IDF weights were learned on, or when new cases stop matching the
+        # fitted vocabulary.
+        self.refit_interval = refit_interval
+        self.max_growth = max_growth
+        self.max_drift = max_drift
+        self.min_drift_samples = min_drift_samples
+        self._lock = threading.RLock()
+        self._id_to_row: Dict[str, int] = {}
+        self._active = np.zeros(0, dtype=bool)
+        # case_vectors may be memory-mapped from a snapshot and shared between
+        # processes, so rows added since the fit live in a separate matrix.
+        self._delta_vectors = None
+        self._pending_vectors = []
+        # Cases add()ed since the last fit/load, so a refit whose read missed
+        # them can carry them over
+        self._added_cases: List[dict] = []
+        self._fitted_at: Optional[float] = None
+        self._fitted_rows = 0
+        self._fitted_mean_terms = 0.0
+        self._added_rows = 0
+        self._added_terms = 0
+
+    @staticmethod
+    def _new_vectorizer() -> TfidfVectorizer:
+        return TfidfVectorizer(
             max_features=100,
             stop_words='english',
             ngram_range=(1, 2)
         )
-        self.case_vectors = None
-        self.case_ids = []
+
+    @property
+    def is_fitted(self) -> bool:
+        return self._fitted_at is not None
+
+    def __len__(self) -> int:
+        return len(self._id_to_row)
 
     def fit(self, cases: List[dict]):
         if not cases:
             return
 
-        descriptions = [case['description'] for case in cases]
-        self.case_ids = [case['id'] for case in cases]
-        self.case_vectors = self.vectorizer.fit_transform(descriptions)
+        descriptions = [case.get('description') or '' for case in cases]
+        case_ids = [case['case_id'] for case in cases]
+        # Fit a fresh vectorizer so concurrent lookups keep using the old one
+        # until the new index is swapped in.
+        vectorizer = self._new_vectorizer()
+        case_vectors = vectorizer.fit_transform(descriptions).tocsr()
+
+        with self._lock:
+            # The table read and vectorising happen outside the lock; cases the
+            # ingest pipeline add()ed meanwhile are not in `cases` and would
+            # otherwise drop out of the index until the next refit.
+            known = set(case_ids)
+            carried = [case for case in self._added_cases if case['case_id'] not in known]
+            self.watermark = None
+            self._install(vectorizer, case_vectors, case_ids, time.time())
+            self._advance_watermark(cases)
+            if carried:
+                self.add(carried)
+
+    def _install(self, vectorizer: TfidfVectorizer, case_vectors, case_ids: List[str], fitted_at: float):
+        self.vectorizer = vectorizer
+        self.case_vectors = case_vectors
+        self.case_ids = case_ids
+        self._id_to_row = {}
+        self._active = np.ones(len(case_ids), dtype=bool)
+        for row, case_id in enumerate(case_ids):
+            if case_id in self._id_to_row:
+                self._active[self._id_to_row[case_id]] = False
+            self._id_to_row[case_id] = row
+        self._delta_vectors = None
+        self._pending_vectors = []
+        self._added_cases = []
+        self._fitted_at = fitted_at
+        self._fitted_rows = len(self._id_to_row)
+        self._fitted_mean_terms = case_vectors.nnz / max(len(case_ids), 1)
+        self._added_rows = 0
+        self._added_terms = 0
+
+    def _advance_watermark(self, cases: List[dict]):
+        timestamps = [_as_timestamp(case.get('created_date')) for case in cases]
+        timestamps = [timestamp for timestamp in timestamps if timestamp is not None]
+        if timestamps:
+            latest = max(timestamps)
+            if self.watermark is None or latest > self.watermark:
+                self.watermark = latest
+
+    def add(self, cases: List[dict]):
+        if not cases:
+            return
+
+        with self._lock:
+            if not self.is_fitted:
+                # Bootstrap from the first batch; the growth trigger will ask for
+                # a proper refit once more cases arrive.
+                self.fit(cases)
+                return
+
+            descriptions = [case.get('description') or '' for case in cases]
+            vectors = self.vectorizer.transform(descriptions).tocsr()
+            self._pending_vectors.append(vectors)
+
+            self._active = np.concatenate([self._active, np.ones(len(cases), dtype=bool)])
+            for case in cases:
+                case_id = case['case_id']
+                self._deactivate(case_id)
+                self._id_to_row[case_id] = len(self.case_ids)
+                self.case_ids.append(case_id)
+
+            self._added_cases.extend(
+                {'case_id': case['case_id'], 'description': case.get('description'),
+                 'created_date': case.get('created_date')}
+                for case in cases
+            )
+            self._added_rows += len(cases)
+            self._added_terms += vectors.nnz
+            self._advance_watermark(cases)
+
+    def remove(self, case_ids: List[str]) -> int:
+        with self._lock:
+            return sum(1 for case_id in case_ids if self._deactivate(case_id))
+
+    def _deactivate(self, case_id: str) -> bool:
+        row = self._id_to_row.pop(case_id, None)
+        if row is None:
+            return False
+        self._active[row] = False
+        return True
+
+    def vocabulary_drift(self) -> float:
+        with self._lock:
+            if self._added_rows < self.min_drift_samples or self._fitted_mean_terms == 0:
+                return 0.0
+            added_mean_terms = self._added_terms / self._added_rows
+            return max(0.0, 1.0 - added_mean_terms / self._fitted_mean_terms)
+
+    def needs_refit(self) -> bool:
+        with self._lock:
+            if not self.is_fitted:
+                return True
+            if self._added_rows == 0:
+                return False
+            if time.time() - self._fitted_at >= self.refit_interval:
+                return True
+            if self._added_rows > self.max_growth * self._fitted_rows:
+                return True
+            return self.vocabulary_drift() > self.max_drift
+
+    def _parts(self) -> list:
+        if self._pending_vectors:
+            parts = ([self._delta_vectors] if self._delta_vectors is not None else []) + self._pending_vectors
+            self._delta_vectors = sp.vstack(parts, format='csr')
+            self._pending_vectors = []
+
+        parts = [self.case_vectors]
+        if self._delta_vectors is not None:
+            parts.append(self._delta_vectors)
+
+        # Drop removed rows once they make up most of the index.
+        if len(self._active) and self._active.sum() * 2 < len(self._active):
+            keep = np.flatnonzero(self._active)
+            self.case_vectors = sp.vstack(parts, format='csr')[keep]
+            self.case_ids = [self.case_ids[row] for row in keep]
+            self._id_to_row = {case_id: row for row, case_id in enumerate(self.case_ids)}
+            self._active = np.ones(len(keep), dtype=bool)
+            self._delta_vectors = None
+            parts = [self.case_vectors]
+
+        return parts
+
+    def _active_matrix(self) -> Tuple[sp.csr_matrix, List[str]]:
+        parts = self._parts()
+        case_vectors = sp.vstack(parts, format='csr') if len(parts) > 1 else parts[0]
+        keep = np.flatnonzero(self._active)
+        return case_vectors[keep], [self.case_ids[row] for row in keep]
 
     def find_similar(self, case_description: str, case_id: str = None, top_k: int = 3) -> List[Tuple[str, float]]:
-        if self.case_vectors is None or len(self.case_ids) == 0:
-            return []
+        with self._lock:
+            if self.case_vectors is None or len(self._id_to_row) == 0:
+                return []
 
-        query_vector = self.vectorizer.transform([case_description])
-        similarities = cosine_similarity(query_vector, self.case_vectors)[0]
+            query_vector = self.vectorizer.transform([case_description])
+            # TF-IDF rows are L2-normalised, so the dot product is the cosine.
+            similarities = np.concatenate([
+                (part @ query_vector.T).toarray().ravel() for part in self._parts()
+            ])
+            similarities[~self._active] = -1.0
 
-        similar_indices = similarities.argsort()[-top_k-1:][::-1]
+            similar_indices = similarities.argsort()[-top_k-1:][::-1]
 
-        results = []
-        for idx in similar_indices:
-            if self.case_ids[idx] != case_id:
-                results.append((self.case_ids[idx], float(similarities[idx])))
-                if len(results) == top_k:
-                    break
+            results = []
+            for idx in similar_indices:
+                if self._active[idx] and self.case_ids[idx] != case_id:
+                    results.append((self.case_ids[idx], float(similarities[idx])))
+                    if len(results) == top_k:
+                        break
+
+            return results
 
+    def top_k_all(self, top_k: int = 3, min_score: float = 0.0, memory_budget_mb: int = 256,
+                  n_jobs: int = 1) -> Dict[str, List[Tuple[str, float]]]:
+        with self._lock:
+            if self.case_vectors is None or len(self._id_to_row) == 0:
+                return {}
+            parts, case_ids, inactive = self._parts(), list(self.case_ids), ~self._active
+        return self._top_k_rows(parts, case_ids, inactive, np.flatnonzero(~inactive),
+                                top_k, min_score, memory_budget_mb, n_jobs)
+
+    def find_similar_batch(self, case_ids: List[str], top_k: int = 3, min_score: float = 0.0,
+                           memory_budget_mb: int = 256) -> Dict[str, List[Tuple[str, float]]]:
+        # Neighbours for cases already in the index, reusing their stored rows
+        # instead of re-vectorising and scanning once per case.
+        with self._lock:
+            if self.case_vectors is None or len(self._id_to_row) == 0:
+                return {}
+            # _parts() may compact the index and renumber rows, so look the
+            # rows up only after it has run
+            parts, all_ids, inactive = self._parts(), list(self.case_ids), ~self._active
+            rows = np.sort(np.array(
+                [self._id_to_row[case_id] for case_id in case_ids if case_id in self._id_to_row], dtype=np.int64
+            ))
+        return self._top_k_rows(parts, all_ids, inactive, rows, top_k, min_score, memory_budget_mb)
+
+    @staticmethod
+    def _top_k_rows(parts: list, case_ids: List[str], inactive: np.ndarray, rows: np.ndarray, top_k: int,
+                    min_score: float, memory_budget_mb: int, n_jobs: int = 1) -> Dict[str, List[Tuple[str, float]]]:
+        # Scores go against each part as stored, with removed rows masked out,
+        # so a memory-mapped base matrix is read in place rather than copied.
+        n_cases = len(case_ids)
+        top_k = min(top_k, n_cases - int(inactive.sum()) - 1)
+        if top_k <= 0 or len(rows) == 0:
+            return {}
+
+        # Each block materialises a dense (rows x n_cases) score matrix plus the
+        # argpartition scratch space; size blocks so all workers fit the budget.
+        n_jobs = effective_n_jobs(n_jobs)
+        budget_bytes = memory_budget_mb * 1024 * 1024 // n_jobs
+        block_rows = max(1, budget_bytes // (n_cases * 8 * 3))
+        blocks = [rows[start:start + block_rows] for start in range(0, len(rows), block_rows)]
+
+        scored = Parallel(n_jobs=n_jobs)(
+            delayed(_top_k_block)(_gather_rows(parts, block), parts, block, inactive, top_k)
+            for block in blocks
+        )
+
+        results = {}
+        for block, (indices, scores) in zip(blocks, scored):
+            for row, case_row in enumerate(block):
+                results[case_ids[case_row]] = [
+                    (case_ids[idx], float(score))
+                    for idx, score in zip(indices[row], scores[row])
+                    if score > min_score
+                ]
         return results
+
+    def save(self, path: str):
+        with self._lock:
+            if not self.is_fitted:
+                return
+            case_vectors, case_ids = self._active_matrix()
+            vocabulary = {term: int(column) for term, column in self.vectorizer.vocabulary_.items()}
+            idf = np.asarray(self.vectorizer.idf_)
+            meta = {
+                'version': self.SNAPSHOT_VERSION,
+                'shape': list(case_vectors.shape),
+                'fitted_at': self._fitted_at,
+                'fitted_rows': self._fitted_rows,
+                'fitted_mean_terms': self._fitted_mean_terms,
+                'watermark': self.watermark.isoformat() if self.watermark else None,
+            }
+
+        os.makedirs(path, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix='.staging-', dir=path)
+        index_dtype = np.int32 if case_vectors.nnz < np.iinfo(np.int32).max else np.int64
+        np.save(os.path.join(staging, 'data.npy'), case_vectors.data)
+        np.save(os.path.join(staging, 'indices.npy'), case_vectors.indices.astype(index_dtype))
+        np.save(os.path.join(staging, 'indptr.npy'), case_vectors.indptr.astype(index_dtype))
+        np.save(os.path.join(staging, 'idf.npy'), idf)
+        np.save(os.path.join(staging, 'case_ids.npy'), np.array(case_ids, dtype=str))
+        with open(os.path.join(staging, 'vocabulary.json'), 'w') as f:
+            json.dump(vocabulary, f)
+        with open(os.path.join(staging, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+
+        name = f"snapshot-{time.time_ns()}"
+        os.rename(staging, os.path.join(path, name))
+        pointer = os.path.join(path, 'CURRENT')
+
+        # Several workers on one host share the directory and refresh on the
+        # same schedule; serialise the pointer swap and cleanup between them.
+        with open(os.path.join(path, 'LOCK'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                with open(pointer) as f:
+                    previous = f.read().strip()
+            except FileNotFoundError:
+                previous = None
+
+            if previous is not None and _snapshot_ns(previous) > _snapshot_ns(name):
+                # Another worker already published a newer snapshot
+                shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+                return
+
+            staged_pointer = f"{pointer}.{os.getpid()}.tmp"
+            with open(staged_pointer, 'w') as f:
+                f.write(name)
+            os.replace(staged_pointer, pointer)
+
+            # Keep the snapshot just replaced: another worker may have read the
+            # old pointer and still be opening its files. Anything older is
+            # unreachable; readers that mapped it keep their pages after unlink.
+            if previous is not None:
+                for entry in os.listdir(path):
+                    if entry.startswith('snapshot-') and _snapshot_ns(entry) < _snapshot_ns(previous):
+                        shutil.rmtree(os.path.join(path, entry), ignore_errors=True)
+
+    def load(self, path: str) -> bool:
+        try:
+            with open(os.path.join(path, 'CURRENT')) as f:
+                snapshot = os.path.join(path, f.read().strip())
+            with open(os.path.join(snapshot, 'meta.json')) as f:
+                meta = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return False
+        if meta.get('version') != self.SNAPSHOT_VERSION:
+            return False
+
+        with open(os.path.join(snapshot, 'vocabulary.json')) as f:
+            vocabulary = json.load(f)
+        case_vectors = sp.csr_matrix((
+            np.load(os.path.join(snapshot, 'data.npy'), mmap_mode='r'),
+            np.load(os.path.join(snapshot, 'indices.npy'), mmap_mode='r'),
+            np.load(os.path.join(snapshot, 'indptr.npy'), mmap_mode='r'),
+        ), shape=tuple(meta['shape']), copy=False)
+        case_ids = np.load(os.path.join(snapshot, 'case_ids.npy')).tolist()
+
+        vectorizer = self._new_vectorizer()
+        vectorizer.vocabulary_ = vocabulary
+        vectorizer.idf_ = np.load(os.path.join(snapshot, 'idf.npy'))
+
+        with self._lock:
+            self._install(vectorizer, case_vectors, case_ids, meta['fitted_at'])
+            self._fitted_rows = meta['fitted_rows']
+            self._fitted_mean_terms = meta['fitted_mean_terms']
+            self.watermark = _as_timestamp(meta['watermark'])
+        return True
@@ -0,0 +1,62 @@
+import gzip
+import hashlib
+from typing import Any
+import orjson
+from fastapi import Request
+from fastapi.responses import Response
+from export import json_default
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Below this size compression costs more than it saves on the wire
+MIN_COMPRESS_BYTES = 1024
+
+def dumps(payload: Any) -> bytes:
+    # orjson handles datetime natively; json_default covers Decimal and bytes
+    return orjson.dumps(payload, default=json_default, option=orjson.OPT_NON_STR_KEYS)
+
+def accepted_encodings(request: Request) -> set:
+    encodings = set()
+    for item in request.headers.get('accept-encoding', '').split(','):
+        coding, _, params = item.strip().partition(';')
+        quality = params.strip()
+        if quality.startswith('q=') and quality[2:].strip() in ('0', '0.0', '0.00', '0.000'):
+            continue
+        if coding:
+            encodings.add(coding.strip().lower())
+    return encodings
+
+def if_none_match(request: Request, etag: str) -> bool:
+    header = request.headers.get('if-none-match')
+    if header is None:
+        return False
+    tags = {tag.strip() for tag in header.split(',')}
+    return etag in tags or '*' in tags
+
+def json_response(request: Request, payload: Any, conditional: bool = False,
+                  status_code: int = 200) -> Response:
+    body = dumps(payload)
+    headers = {'Vary': 'Accept-Encoding'}
+    if conditional:
+        # The ETag hashes the body itself, so every worker, before and after a
+        # restart, tags the same data the same way; a match skips compression
+        # and the transfer.
+        etag = f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+        headers['ETag'] = etag
+        headers['Cache-Control'] = 'no-cache'
+        if if_none_match(request, etag):
+            return Response(status_code=304, headers=headers)
+
+    if len(body) >= MIN_COMPRESS_BYTES:
+        encodings = accepted_encodings(request)
+        if brotli is not None and 'br' in encodings:
+            body = brotli.compress(body, quality=4)
+            headers['Content-Encoding'] = 'br'
+        elif 'gzip' in encodings:
+            body = gzip.compress(body, compresslevel=5)
+            headers['Content-Encoding'] = 'gzip'
+
+    return Response(body, status_code=status_code, media_type='application/json', headers=headers)
@@ -0,0 +1,125 @@
+import heapq
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Leading padding turns short prefixes into trigrams too, so prefix lookups of
+# any length resolve through the postings lists.
+_PAD = '\x00\x00'
+
+def trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+class _FieldIndex:
+    def __init__(self):
+        self.values: Dict[int, Tuple[str, str]] = {}
+        self.postings: Dict[str, Set[int]] = {}
+
+    def add(self, doc: int, value: Optional[str]):
+        self.remove(doc)
+        if not value:
+            return
+        lowered = value.lower()
+        self.values[doc] = (value, lowered)
+        for gram in trigrams(_PAD + lowered):
+            self.postings.setdefault(gram, set()).add(doc)
+
+    def remove(self, doc: int):
+        entry = self.values.pop(doc, None)
+        if entry is None:
+            return
+        for gram in trigrams(_PAD + entry[1]):
+            docs = self.postings.get(gram)
+            if docs is not None:
+                docs.discard(doc)
+                if not docs:
+                    del self.postings[gram]
+
+    def candidates(self, grams: Set[str]) -> Set[int]:
+        if not grams:
+            return set(self.values)
+        postings = []
+        for gram in grams:
+            docs = self.postings.get(gram)
+            if not docs:
+                return set()
+            postings.append(docs)
+        postings.sort(key=len)
+        result = set(postings[0])
+        for docs in postings[1:]:
+            result &= docs
+            if not result:
+                break
+        return result
+
+    def search(self, query: str, prefix: bool = False) -> List[int]:
+        query = query.lower()
+        if prefix:
+            docs = self.candidates(trigrams(_PAD + query))
+            return [doc for doc in docs if self.values[doc][1].startswith(query)]
+        if len(query) < 3:
+            # Too short for a trigram; scan the stored values instead
+            return [doc for doc, (_, lowered) in self.values.items() if query in lowered]
+        docs = self.candidates(trigrams(query))
+        return [doc for doc in docs if query in self.values[doc][1]]
+
+class TrigramIndex:
+    FIELDS = ('case_id', 'customer_name')
+
+    def __init__(self):
+        self.ready = False
+        # Rows created at or after this may be missing (other writers)
+        self.built_at: Optional[datetime] = None
+        self._lock = threading.RLock()
+        self._case_ids: List[Optional[str]] = []
+        self._docs: Dict[str, int] = {}
+        self._fields = {field: _FieldIndex() for field in self.FIELDS}
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def add_cases(self, cases: Iterable[dict]):
+        with self._lock:
+            for case in cases:
+                case_id = case['case_id']
+                doc = self._docs.get(case_id)
+                if doc is None:
+                    doc = len(self._case_ids)
+                    self._case_ids.append(case_id)
+                    self._docs[case_id] = doc
+                for field in self.FIELDS:
+                    if field in case:
+                        self._fields[field].add(doc, case[field])
+
+    def remove(self, case_id: str):
+        with self._lock:
+            doc = self._docs.pop(case_id, None)
+            if doc is None:
+                return
+            self._case_ids[doc] = None
+            for index in self._fields.values():
+                index.remove(doc)
+
+    def search(self, customer_name: Optional[str] = None, case_id: Optional[str] = None,
+               prefix: bool = False) -> List[str]:
+        with self._lock:
+            docs = None
+            for field, query in (('customer_name', customer_name), ('case_id', case_id)):
+                if query:
+                    matches = set(self._fields[field].search(query, prefix))
+                    docs = matches if docs is None else docs & matches
+            if docs is None:
+                return []
+            return sorted(self._case_ids[doc] for doc in docs)
+
+    def suggest(self, query: str, limit: int = 10) -> List[dict]:
+        with self._lock:
+            results = []
+            for field in self.FIELDS:
+                index = self._fields[field]
+                # Short prefixes can match every doc; select the first few
+                # instead of sorting all of them
+                docs = heapq.nsmallest(limit, index.search(query, prefix=True), key=lambda doc: index.values[doc][1])
+                for doc in docs:
+                    results.append({'case_id': self._case_ids[doc], 'field': field, 'value': index.values[doc][0]})
+            return results[:limit]
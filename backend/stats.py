@@ -0,0 +1,51 @@
+import threading
+import time
+from typing import Dict, List, Optional
+
+STAT_FIELDS = ('total_cases', 'high_priority', 'incidents', 'open_cases')
+# Columns whose changes move a counter; mirrors the aggregate in
+# Database.reconcile_dashboard_stats.
+STAT_COLUMNS = frozenset(('priority', 'type', 'status'))
+
+def case_contribution(case: dict) -> Dict[str, int]:
+    return {
+        'total_cases': 1,
+        'high_priority': int(case.get('priority') in ('High', 'Critical')),
+        'incidents': int(case.get('type') == 'Incident'),
+        'open_cases': int(case.get('status') == 'Open')
+    }
+
+class DashboardCounters:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts: Optional[Dict[str, int]] = None
+        self.reconciled_at: Optional[float] = None
+
+    def snapshot(self) -> Optional[dict]:
+        with self._lock:
+            return dict(self._counts) if self._counts is not None else None
+
+    def reset(self, counts: dict):
+        with self._lock:
+            self._counts = {field: int(counts.get(field) or 0) for field in STAT_FIELDS}
+            self.reconciled_at = time.time()
+
+    def _apply(self, contribution: Dict[str, int], sign: int):
+        for field, value in contribution.items():
+            self._counts[field] += sign * value
+
+    def add_cases(self, cases: List[dict]):
+        with self._lock:
+            # Until the first reconcile there is nothing to adjust; the
+            # aggregate will include these rows.
+            if self._counts is None:
+                return
+            for case in cases:
+                self._apply(case_contribution(case), 1)
+
+    def update_case(self, before: dict, after: dict):
+        with self._lock:
+            if self._counts is None:
+                return
+            self._apply(case_contribution(before), -1)
+            self._apply(case_contribution(after), 1)
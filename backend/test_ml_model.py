@@ -0,0 +1,30 @@
+from ml_model import SimilarityDetector
+
+TOPICS = ['login password reset', 'payment invoice charge', 'api endpoint timeout', 'database backup failure']
+
+
+def make_cases(n):
+    return [
+        {'case_id': f'CASE-{i}', 'description': f'{TOPICS[i % len(TOPICS)]} report {i}'}
+        for i in range(n)
+    ]
+
+
+def test_find_similar_batch_after_compaction():
+    # Removing more than half the rows makes the next lookup compact the index
+    # and renumber every row; the batch must be resolved against the new rows.
+    detector = SimilarityDetector()
+    detector.fit(make_cases(40))
+    detector.remove([f'CASE-{i}' for i in range(25)])
+
+    queried = [f'CASE-{i}' for i in range(25, 40)]
+    results = detector.find_similar_batch(queried, top_k=2)
+
+    assert set(results) == set(queried)
+    for case_id, neighbours in results.items():
+        assert neighbours
+        topic = int(case_id.split('-')[1]) % len(TOPICS)
+        for neighbour, _ in neighbours:
+            number = int(neighbour.split('-')[1])
+            assert number >= 25 and neighbour != case_id
+            assert number % len(TOPICS) == topic
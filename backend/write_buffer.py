@@ -0,0 +1,88 @@
+import logging
+import threading
+from typing import Callable, List, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+class WriteBuffer:
+    # write_rows sends one batch and returns the indices of the rows that
+    # failed; those are retried on later flushes up to max_attempts times.
+    def __init__(self, name: str, write_rows: Callable[[List[dict]], Sequence[int]],
+                 max_rows: int = 500, max_delay: float = 5.0, max_attempts: int = 3):
+        self.name = name
+        self.write_rows = write_rows
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        self.written = 0
+        self.retried = 0
+        self.dropped = 0
+        self._rows: List[Tuple[dict, int]] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=f"{name}-writer", daemon=True)
+        self._thread.start()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._rows)
+
+    def add(self, *rows: dict):
+        with self._lock:
+            self._rows.extend((row, 0) for row in rows)
+            full = len(self._rows) >= self.max_rows
+        if full:
+            self._wakeup.set()
+
+    def _run(self):
+        while not self._closed:
+            self._wakeup.wait(self.max_delay)
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self) -> int:
+        with self._flush_lock:
+            with self._lock:
+                pending, self._rows = self._rows, []
+
+            written = 0
+            retry = []
+            for start in range(0, len(pending), self.max_rows):
+                batch = pending[start:start + self.max_rows]
+                try:
+                    failed = set(self.write_rows([row for row, _ in batch]))
+                except Exception as e:
+                    logger.error(f"{self.name}: batch of {len(batch)} rows failed: {e}")
+                    failed = set(range(len(batch)))
+
+                written += len(batch) - len(failed)
+                for index in sorted(failed):
+                    row, attempts = batch[index]
+                    if attempts + 1 < self.max_attempts:
+                        retry.append((row, attempts + 1))
+                    else:
+                        self.dropped += 1
+                        logger.error(f"{self.name}: dropping row after {self.max_attempts} attempts: {row}")
+
+            self.written += written
+            self.retried += len(retry)
+            if retry:
+                with self._lock:
+                    self._rows = retry + self._rows
+            return written
+
+    def close(self):
+        self._closed = True
+        self._wakeup.set()
+        self._thread.join(timeout=self.max_delay + 1)
+        self.flush()
+
+    def stats(self) -> dict:
+        return {
+            'pending': len(self),
+            'written': self.written,
+            'retried': self.retried,
+            'dropped': self.dropped
+        }
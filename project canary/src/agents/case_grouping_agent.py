@@ -1,19 +1,42 @@
 from google.cloud import aiplatform
 from utils.prompts import CASE_GROUPING_PROMPT
+from utils.llm import clean_response, generate_async
+from utils.batching import DEFAULT_TOKEN_BUDGET, case_budget, chunked_map, chunked_map_async, render_cases
 from vertexai.preview.generative_models import GenerativeModel
 import vertexai
+import json
 
 class CaseGroupingAgent:
 
-    def __init__(self, project_id: str, location="us-central1"):
+    def __init__(self, project_id: str, location="us-central1", token_budget=DEFAULT_TOKEN_BUDGET):
         aiplatform.init(project=project_id, location=location)
-        model = GenerativeModel("gemini-2.0-flash")
+        self.model_name = "gemini-2.0-flash"
+        model = GenerativeModel(self.model_name)
         self.model = model
+        self.token_budget = token_budget
 
+    # Groupings depend on which cases share a request, so they are never
+    # served from the response cache. A grouping only lists cases from the
+    # same chunk; MinHash (NearDuplicateAgent) covers the full history.
     def classify(self, case):
-        prompt = CASE_GROUPING_PROMPT.format(
-            cases=case
-        )
+        def generate(cases):
+            prompt = CASE_GROUPING_PROMPT.format(
+                cases=render_cases(cases)
+            )
 
-        response = self.model.generate_content(prompt)
-        return response.text.replace("```json", "").replace("```", "").strip().lower()
+            response = self.model.generate_content(prompt)
+            return json.loads(clean_response(response.text))
+
+        budget = case_budget(self.token_budget, CASE_GROUPING_PROMPT)
+        return json.dumps(chunked_map(case, generate, budget))
+
+    async def classify_async(self, case, limiter=None):
+        async def generate(cases):
+            prompt = CASE_GROUPING_PROMPT.format(
+                cases=render_cases(cases)
+            )
+
+            return json.loads(clean_response(await generate_async(self.model, prompt, limiter)))
+
+        budget = case_budget(self.token_budget, CASE_GROUPING_PROMPT)
+        return json.dumps(await chunked_map_async(case, generate, budget))
@@ -0,0 +1,117 @@
+from google.cloud import aiplatform
+from utils.llm import generate_async
+from utils.batching import DEFAULT_TOKEN_BUDGET, case_budget, chunked_map, chunked_map_async, render_cases
+from utils.prompts import CASE_TRIAGE_PROMPT
+from utils.response_cache import cached_map, cached_map_async
+from vertexai.preview.generative_models import GenerationConfig, GenerativeModel
+import json
+
+TRIAGE_FIELDS = ["type", "product", "priority", "track_ids", "root_cause", "similar_cases"]
+# Answers that refer to other cases in the same request; they are only
+# meaningful for the batch they were computed with
+BATCH_FIELDS = ["similar_cases"]
+
+TRIAGE_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {
+            "case_id": {"type": "STRING"},
+            "type": {"type": "STRING", "enum": ["incident", "inquiry"]},
+            "product": {"type": "STRING", "enum": ["air", "hotel", "cars", "rail"]},
+            "priority": {"type": "STRING", "enum": ["high", "medium", "low"]},
+            "track_ids": {"type": "ARRAY", "items": {"type": "STRING"}},
+            "root_cause": {"type": "STRING", "enum": ["api issue", "price issue", "supplier issue", "missing fare access"]},
+            "similar_cases": {"type": "ARRAY", "items": {"type": "STRING"}}
+        },
+        "required": ["case_id"] + TRIAGE_FIELDS
+    }
+}
+
+
+class CaseTriageAgent:
+    # One request per batch instead of one each for type, product, priority,
+    # track ids, root cause and grouping.
+
+    def __init__(self, project_id: str, location="us-central1", cache=None, token_budget=DEFAULT_TOKEN_BUDGET):
+        aiplatform.init(project=project_id, location=location)
+        self.model_name = "gemini-2.0-flash"
+        model = GenerativeModel(self.model_name)
+        self.model = model
+        self.cache = cache
+        self.token_budget = token_budget
+        self.generation_config = GenerationConfig(
+            response_mime_type="application/json",
+            response_schema=TRIAGE_SCHEMA
+        )
+
+    def classify(self, case, track_messages):
+        def generate(cases):
+            prompt = CASE_TRIAGE_PROMPT.format(
+                cases=render_cases(cases),
+                track_messages=track_messages
+            )
+
+            response = self.model.generate_content(prompt, generation_config=self.generation_config)
+            return self.cacheable(self.parse(response.text))
+
+        budget = case_budget(self.token_budget, CASE_TRIAGE_PROMPT, track_messages)
+        return self.split(cached_map(self.cache, CASE_TRIAGE_PROMPT, self.model_name, case, track_messages,
+                                     lambda cases: chunked_map(cases, generate, budget)))
+
+    async def classify_async(self, case, track_messages, limiter=None):
+        async def generate(cases):
+            prompt = CASE_TRIAGE_PROMPT.format(
+                cases=render_cases(cases),
+                track_messages=track_messages
+            )
+
+            text = await generate_async(self.model, prompt, limiter, generation_config=self.generation_config)
+            return self.cacheable(self.parse(text))
+
+        budget = case_budget(self.token_budget, CASE_TRIAGE_PROMPT, track_messages)
+        return self.split(await cached_map_async(self.cache, CASE_TRIAGE_PROMPT, self.model_name, case, track_messages,
+                                                 lambda cases: chunked_map_async(cases, generate, budget)))
+
+    # case id -> {field: value}, all lowercase; this per-case shape is what
+    # the response cache stores.
+    @staticmethod
+    def parse(text):
+        items = json.loads(text.replace("```json", "").replace("```", "").strip())
+        results = {}
+        for item in items:
+            cid = str(item.get("case_id", "")).lower()
+            if not cid:
+                continue
+            result = {}
+            for field in TRIAGE_FIELDS:
+                value = item.get(field)
+                if isinstance(value, list):
+                    value = [str(v).lower() for v in value if str(v).lower() != "none"]
+                elif isinstance(value, str):
+                    value = value.lower()
+                result[field] = value
+            results[cid] = result
+        return results
+
+    # With a cache, a batch mixes stored answers with fresh ones computed over
+    # only the unseen cases, so batch-relative fields would point at the wrong
+    # set (and identical cases would share one answer). Drop them; main.py
+    # groups the full batch with MinHash instead.
+    def cacheable(self, results):
+        if self.cache is None:
+            return results
+        return {
+            cid: {field: value for field, value in result.items() if field not in BATCH_FIELDS}
+            for cid, result in results.items()
+        }
+
+    # Turns per-case results into the per-task maps the single-task agents
+    # return once parsed: field -> {case id: value}.
+    @staticmethod
+    def split(results):
+        outputs = {field: {} for field in TRIAGE_FIELDS}
+        for cid, result in results.items():
+            for field in TRIAGE_FIELDS:
+                outputs[field][cid] = result.get(field)
+        return outputs
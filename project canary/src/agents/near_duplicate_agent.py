@@ -0,0 +1,95 @@
+from utils.minhash_lsh import MinHashLSH
+import json
+import sqlite3
+import threading
+
+
+class NearDuplicateAgent:
+    # Matches on containment rather than Jaccard: a follow-up that quotes an
+    # earlier thread shares most of its text but adds a lot of its own. 64
+    # bands of 2 rows still make such pairs candidates at a Jaccard near 0.3.
+    #
+    # With a path, signatures are kept in sqlite and reloaded on start, so a
+    # new case is matched against every case seen in earlier runs, not just
+    # the current batch.
+
+    def __init__(self, path=None, threshold=0.7, num_perm=128, bands=64):
+        self.index = MinHashLSH(threshold=threshold, num_perm=num_perm, bands=bands, containment=True)
+        self.neighbours = {}
+        self._lock = threading.Lock()
+        self._db = None
+        if path is not None:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS signatures ("
+                "cid TEXT PRIMARY KEY, size INTEGER NOT NULL, signature TEXT NOT NULL)"
+            )
+            self._db.execute("CREATE TABLE IF NOT EXISTS params (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self._load()
+
+    def _params(self):
+        # Signatures are only comparable under the same permutations and shingling
+        return json.dumps([self.index.num_perm, self.index.seed, self.index.shingle_size])
+
+    def _load(self):
+        stored = self._db.execute("SELECT value FROM params WHERE name = 'minhash'").fetchone()
+        if stored is None or stored[0] != self._params():
+            self._db.execute("DELETE FROM signatures")
+            self._db.execute("INSERT OR REPLACE INTO params VALUES ('minhash', ?)", (self._params(),))
+            self._db.commit()
+            return
+        for cid, size, signature in self._db.execute("SELECT cid, size, signature FROM signatures"):
+            self.index.restore(cid, json.loads(signature), size)
+
+    @staticmethod
+    def case_text(case):
+        return f"{case.get('description') or ''} {case.get('emails') or ''}"
+
+    def add(self, case):
+        with self._lock:
+            matches = self._add(case)
+            self._commit()
+        return matches
+
+    def remove(self, cid):
+        with self._lock:
+            removed = self._remove(cid)
+            self._commit()
+        return removed
+
+    # Same shape as CaseGroupingAgent output once parsed: case id -> similar case ids.
+    def classify(self, case):
+        with self._lock:
+            for item in case:
+                self._add(item)
+            self._commit()
+            return {item["id"].lower(): sorted(self.neighbours.get(item["id"].lower(), ())) for item in case}
+
+    def _add(self, case):
+        cid = case["id"].lower()
+        self._remove(cid)
+        matches = self.index.insert(cid, self.case_text(case))
+        self.neighbours[cid] = set(matches)
+        for match in matches:
+            self.neighbours.setdefault(match, set()).add(cid)
+        entry = self.index.entry(cid)
+        if self._db is not None and entry is not None:
+            signature, size = entry
+            self._db.execute("INSERT OR REPLACE INTO signatures VALUES (?, ?, ?)", (cid, size, json.dumps(signature)))
+        return matches
+
+    def _remove(self, cid):
+        for match in self.neighbours.pop(cid, ()):
+            self.neighbours.get(match, set()).discard(cid)
+        if self._db is not None:
+            self._db.execute("DELETE FROM signatures WHERE cid = ?", (cid,))
+        return self.index.remove(cid)
+
+    def _commit(self):
+        if self._db is not None:
+            self._db.commit()
+
+    def close(self):
+        if self._db is not None:
+            with self._lock:
+                self._db.close()
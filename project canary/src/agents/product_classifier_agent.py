@@ -1,19 +1,43 @@
 from google.cloud import aiplatform
 from utils.prompts import PRODUCT_CLASSIFICATION_PROMPT
+from utils.llm import clean_response, generate_async
+from utils.batching import DEFAULT_TOKEN_BUDGET, case_budget, chunked_map, chunked_map_async, render_cases
+from utils.response_cache import cached_map, cached_map_async
 from vertexai.preview.generative_models import GenerativeModel
 import vertexai
+import json
 
 class ProductClassifierAgent:
 
-    def __init__(self, project_id: str, location="us-central1"):
+    def __init__(self, project_id: str, location="us-central1", cache=None, token_budget=DEFAULT_TOKEN_BUDGET):
         aiplatform.init(project=project_id, location=location)
-        model = GenerativeModel("gemini-2.0-flash")
+        self.model_name = "gemini-2.0-flash"
+        model = GenerativeModel(self.model_name)
         self.model = model
+        self.cache = cache
+        self.token_budget = token_budget
 
     def classify(self, case):
-        prompt = PRODUCT_CLASSIFICATION_PROMPT.format(
-            cases=case,
-        )
+        def generate(cases):
+            prompt = PRODUCT_CLASSIFICATION_PROMPT.format(
+                cases=render_cases(cases),
+            )
 
-        response = self.model.generate_content(prompt)
-        return response.text.replace("```json", "").replace("```", "").strip().lower()
+            response = self.model.generate_content(prompt)
+            return json.loads(clean_response(response.text))
+
+        budget = case_budget(self.token_budget, PRODUCT_CLASSIFICATION_PROMPT)
+        return json.dumps(cached_map(self.cache, PRODUCT_CLASSIFICATION_PROMPT, self.model_name, case, None,
+                                     lambda cases: chunked_map(cases, generate, budget)))
+
+    async def classify_async(self, case, limiter=None):
+        async def generate(cases):
+            prompt = PRODUCT_CLASSIFICATION_PROMPT.format(
+                cases=render_cases(cases),
+            )
+
+            return json.loads(clean_response(await generate_async(self.model, prompt, limiter)))
+
+        budget = case_budget(self.token_budget, PRODUCT_CLASSIFICATION_PROMPT)
+        return json.dumps(await cached_map_async(self.cache, PRODUCT_CLASSIFICATION_PROMPT, self.model_name, case, None,
+                                                 lambda cases: chunked_map_async(cases, generate, budget)))
@@ -2,39 +2,66 @@ from google.cloud import aiplatform
 from utils.prompts import SENTIMENT_CLASSIFICATION_PROMPT
 from utils.prompts import CASE_TO_TRACKING_ID_PROMPT
 from utils.prompts import CASE_ROOT_CAUSE_PROMPT
+from utils.llm import clean_response, generate_async
+from utils.batching import DEFAULT_TOKEN_BUDGET, case_budget, chunked_map, chunked_map_async, render_cases
+from utils.response_cache import cached_map, cached_map_async
 from vertexai.preview.generative_models import GenerativeModel
 import vertexai
+import json
 
 class SentimentalClassifierAgent:
 
-    def __init__(self, project_id: str, location="us-central1"):
+    def __init__(self, project_id: str, location="us-central1", cache=None, token_budget=DEFAULT_TOKEN_BUDGET):
         aiplatform.init(project=project_id, location=location)
-        model = GenerativeModel("gemini-2.0-flash")
+        self.model_name = "gemini-2.0-flash"
+        model = GenerativeModel(self.model_name)
         self.model = model
+        self.cache = cache
+        self.token_budget = token_budget
 
-    def classify(self, case,track_messages):
-        prompt = SENTIMENT_CLASSIFICATION_PROMPT.format(
-            cases=case,
-            track_messages=track_messages
-        )
+    # Track messages are part of every prompt here, so they are part of the
+    # cache key too: editing a track re-asks for every case.
+    def _run(self, template, case, track_messages):
+        def generate(cases):
+            prompt = template.format(
+                cases=render_cases(cases),
+                track_messages=track_messages
+            )
 
-        response = self.model.generate_content(prompt)
-        return response.text.replace("```json", "").replace("```", "").strip().lower()
+            response = self.model.generate_content(prompt)
+            return json.loads(clean_response(response.text))
 
-    def caseToTrackId(self, case,track_messages):
-        prompt = CASE_TO_TRACKING_ID_PROMPT.format(
-            cases=case,
-            track_messages=track_messages
-        )
+        budget = case_budget(self.token_budget, template, track_messages)
+        return json.dumps(cached_map(self.cache, template, self.model_name, case, track_messages,
+                                     lambda cases: chunked_map(cases, generate, budget)))
+
+    async def _run_async(self, template, case, track_messages, limiter):
+        async def generate(cases):
+            prompt = template.format(
+                cases=render_cases(cases),
+                track_messages=track_messages
+            )
+
+            return json.loads(clean_response(await generate_async(self.model, prompt, limiter)))
+
+        budget = case_budget(self.token_budget, template, track_messages)
+        return json.dumps(await cached_map_async(self.cache, template, self.model_name, case, track_messages,
+                                                 lambda cases: chunked_map_async(cases, generate, budget)))
 
-        response = self.model.generate_content(prompt)
-        return response.text.replace("```json", "").replace("```", "").strip().lower()
+    def classify(self, case,track_messages):
+        return self._run(SENTIMENT_CLASSIFICATION_PROMPT, case, track_messages)
+
+    def caseToTrackId(self, case,track_messages):
+        return self._run(CASE_TO_TRACKING_ID_PROMPT, case, track_messages)
     
     def getRootCause(self, case,track_messages):
-        prompt = CASE_ROOT_CAUSE_PROMPT.format(
-            cases=case,
-            track_messages=track_messages
-        )
+        return self._run(CASE_ROOT_CAUSE_PROMPT, case, track_messages)
+
+    async def classify_async(self, case,track_messages, limiter=None):
+        return await self._run_async(SENTIMENT_CLASSIFICATION_PROMPT, case, track_messages, limiter)
+
+    async def caseToTrackIdAsync(self, case,track_messages, limiter=None):
+        return await self._run_async(CASE_TO_TRACKING_ID_PROMPT, case, track_messages, limiter)
 
-        response = self.model.generate_content(prompt)
-        return response.text.replace("```json", "").replace("```", "").strip().lower()
+    async def getRootCauseAsync(self, case,track_messages, limiter=None):
+        return await self._run_async(CASE_ROOT_CAUSE_PROMPT, case, track_messages, limiter)
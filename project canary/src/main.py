@@ -1,15 +1,17 @@
-from agents.type_classifier_agent import TypeClassifierAgent
-from agents.product_classifier_agent import ProductClassifierAgent
-from agents.sentimental_classifier_agent import SentimentalClassifierAgent
-from agents.case_grouping_agent import CaseGroupingAgent
+from agents.case_triage_agent import CaseTriageAgent
+from agents.near_duplicate_agent import NearDuplicateAgent
 from utils.BigQueryWriteUtil import BigQueryWriteUtil
-import json
+from utils.llm import AgentOrchestrator
+from utils.mail_chain import preprocess_cases
+from utils.rate_limiter import RateLimiter
+from utils.response_cache import ResponseCache
+import asyncio
 
 if __name__ == "__main__":
-    TypeAgent = TypeClassifierAgent(project_id="sab-dev-nghp-jobs-4063")
-    ProductAgent = ProductClassifierAgent(project_id="sab-dev-nghp-jobs-4063")
-    SentimentalAgent = SentimentalClassifierAgent(project_id="sab-dev-nghp-jobs-4063")
-    CaseGroupingAgent = CaseGroupingAgent(project_id="sab-dev-nghp-jobs-4063")
+    Cache = ResponseCache("llm_cache.sqlite3", max_entries=100000, max_age=7 * 24 * 3600)
+    TriageAgent = CaseTriageAgent(project_id="sab-dev-nghp-jobs-4063", cache=Cache)
+    NearDuplicateAgent = NearDuplicateAgent("near_duplicates.sqlite3")
+    Orchestrator = AgentOrchestrator(RateLimiter(requests_per_minute=60, tokens_per_minute=1000000), deadline=120.0)
 
     sample_case = [{
         "id": "500Uo00000Spi6vIAB",
@@ -70,13 +72,31 @@ if __name__ == "__main__":
         {"message":"BCD/Marriott","id":"TRACK-004"}
     ]
 
-    type_agent_output = TypeAgent.classify(sample_case)
-    product_agent_output = ProductAgent.classify(sample_case)
-    sentimental_agent_output = SentimentalAgent.classify(sample_case,track_messages)
-    case_grouping_agent_output = CaseGroupingAgent.classify(sample_case)
-    case_to_track_id_mapping = SentimentalAgent.caseToTrackId(sample_case,track_messages)
-    case_to_track_id_mapping = SentimentalAgent.caseToTrackId(sample_case,track_messages)
-    case_root_cause_mapping = SentimentalAgent.getRootCause(sample_case,track_messages)
+    # Strip auto-acks, banners, tracking links and quoted replies before the
+    # threads reach the prompts, the cache keys or BigQuery
+    emails_before = sum(len(case.get("emails") or "") for case in sample_case)
+    sample_case = preprocess_cases(sample_case)
+    print("Emails:", emails_before, "->", sum(len(case["emails"]) for case in sample_case), "chars")
+
+    # The Gemini call and the local MinHash pass are independent; run them side by side
+    outputs = Orchestrator.run({
+        "triage": TriageAgent.classify_async(sample_case,track_messages,Orchestrator.limiter),
+        "near_duplicates": asyncio.to_thread(NearDuplicateAgent.classify, sample_case)
+    })
+    triage_output = outputs["triage"]
+    type_agent_output = triage_output["type"]
+    product_agent_output = triage_output["product"]
+    sentimental_agent_output = triage_output["priority"]
+    case_to_track_id_mapping = triage_output["track_ids"]
+    case_root_cause_mapping = triage_output["root_cause"]
+    # Near duplicates come from MinHash over this batch and every case stored
+    # from earlier runs. The model's own grouping is only present when the
+    # triage agent runs without a cache.
+    near_duplicates = outputs["near_duplicates"]
+    case_grouping_agent_output = {
+        cid: sorted(set(similar) | set(triage_output["similar_cases"].get(cid) or []))
+        for cid, similar in near_duplicates.items()
+    }
 
     print("Type:", type_agent_output)
     print("Product:", product_agent_output)
@@ -84,4 +104,5 @@ if __name__ == "__main__":
     print("Grouping:", case_grouping_agent_output)
     print("Tracking", case_to_track_id_mapping)
     print("Root Caue", case_root_cause_mapping)
-    BigQueryWriteUtil.insert(sample_case,json.loads(type_agent_output),json.loads(product_agent_output),json.loads(sentimental_agent_output),json.loads(case_grouping_agent_output),json.loads(case_to_track_id_mapping),json.loads(case_root_cause_mapping))
+    print("LLM cache", Cache.stats())
+    BigQueryWriteUtil.insert(sample_case,type_agent_output,product_agent_output,sentimental_agent_output,case_grouping_agent_output,case_to_track_id_mapping,case_root_cause_mapping)
@@ -35,7 +35,7 @@ class BigQueryWriteUtil:
                 "comments":None,
                 "jira_id":None if random.choice([True, False]) else "PTJIRA" + str(random.randint(1, 9999)),
                 "snow_id":None if random.choice([True, False]) else "INC" + str(random.randint(10000, 99999)),
-                "mail_chain":None,
+                "mail_chain":case.get("mail_chain"),
                 "ROOTCAUSE":root_cause_mapping.get(cid.lower())
             }
             rows_to_insert_cases.append(merged)
@@ -44,11 +44,16 @@ class BigQueryWriteUtil:
         rows_to_insert_cases_track = []
         for case in sample_case:
             cid = case["id"].lower()
-            merged= {
-                "case_id": cid,
-                "track_id": case_to_track_id_mapping.get(cid.lower())
-            }
-            rows_to_insert_cases_track.append(merged)
+            # A case can match several tracks; one map row per track id
+            track_ids = case_to_track_id_mapping.get(cid.lower())
+            if not isinstance(track_ids, list):
+                track_ids = [track_ids]
+            for track_id in track_ids or [None]:
+                merged= {
+                    "case_id": cid,
+                    "track_id": track_id
+                }
+                rows_to_insert_cases_track.append(merged)
 
         
         errors = client.insert_rows_json(table_ref_cases, rows_to_insert_cases)
@@ -0,0 +1,83 @@
+from utils.llm import estimate_tokens
+import asyncio
+import re
+
+# Fields the prompts actually reason over, in the order they are rendered
+CASE_FIELDS = ("id", "name", "priority", "status", "description", "emails")
+# Trimmed, in this order, when a single case is larger than the budget
+TRIMMABLE_FIELDS = ("emails", "description")
+
+DEFAULT_TOKEN_BUDGET = 30000
+# Output grows with the number of cases too; keep each answer well inside
+# the model's output limit
+MAX_CASES_PER_CHUNK = 50
+
+
+def _compact(value):
+    return re.sub(r"\s+", " ", str(value)).strip()
+
+
+# "field: value" lines instead of the dict repr: no quotes, braces or
+# escaped characters, and no fields the prompts don't use.
+def render_case(case):
+    return "\n".join(f"{field}: {_compact(case[field])}" for field in CASE_FIELDS if case.get(field))
+
+
+def render_cases(cases):
+    return "\n---\n".join(render_case(case) for case in cases)
+
+
+def fit_case(case, budget):
+    case = dict(case)
+    overflow = (estimate_tokens(render_case(case)) - budget) * 4
+    for field in TRIMMABLE_FIELDS:
+        if overflow <= 0:
+            break
+        value = _compact(case.get(field) or "")
+        keep = max(0, len(value) - overflow)
+        overflow -= len(value) - keep
+        case[field] = value[:keep]
+    return case
+
+
+def pack(cases, budget=DEFAULT_TOKEN_BUDGET, max_cases=MAX_CASES_PER_CHUNK):
+    # Greedy, in input order: start a new chunk whenever the next case would
+    # push the current one past the budget. A case that is over budget on its
+    # own gets its emails, then description, trimmed to fit.
+    chunks = []
+    chunk, used = [], 0
+    for case in cases:
+        tokens = estimate_tokens(render_case(case))
+        if tokens > budget:
+            case = fit_case(case, budget)
+            tokens = budget
+        if chunk and (used + tokens > budget or len(chunk) >= max_cases):
+            chunks.append(chunk)
+            chunk, used = [], 0
+        chunk.append(case)
+        used += tokens
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def case_budget(token_budget, template, context=None):
+    # What is left for cases once the prompt text and track messages are in
+    overhead = estimate_tokens(template) + (estimate_tokens(str(context)) if context is not None else 0)
+    return max(1, token_budget - overhead)
+
+
+def chunked_map(cases, generate, budget=DEFAULT_TOKEN_BUDGET, max_cases=MAX_CASES_PER_CHUNK):
+    # generate(chunk) sends one request and returns {case id: value}
+    results = {}
+    for chunk in pack(cases, budget, max_cases):
+        results.update(generate(chunk))
+    return results
+
+
+async def chunked_map_async(cases, generate, budget=DEFAULT_TOKEN_BUDGET, max_cases=MAX_CASES_PER_CHUNK):
+    results = {}
+    # Chunks go out concurrently; the caller's rate limiter paces them
+    for chunk_results in await asyncio.gather(*(generate(chunk) for chunk in pack(cases, budget, max_cases))):
+        results.update(chunk_results)
+    return results
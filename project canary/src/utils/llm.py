@@ -0,0 +1,46 @@
+from google.api_core.exceptions import ResourceExhausted, ServiceUnavailable, TooManyRequests
+import asyncio
+import random
+
+QUOTA_ERRORS = (ResourceExhausted, TooManyRequests, ServiceUnavailable)
+
+
+def estimate_tokens(text):
+    # Roughly four characters per token for Gemini on English text
+    return len(text) // 4 + 1
+
+
+def clean_response(text):
+    return text.replace("```json", "").replace("```", "").strip().lower()
+
+
+async def generate_async(model, prompt, limiter=None, max_attempts=5, base_delay=1.0, **kwargs):
+    for attempt in range(max_attempts):
+        if limiter is not None:
+            await limiter.acquire(estimate_tokens(prompt))
+        try:
+            response = await model.generate_content_async(prompt, **kwargs)
+            return response.text
+        except QUOTA_ERRORS:
+            if attempt + 1 == max_attempts:
+                raise
+            # Full jitter so concurrent calls that hit the quota together
+            # don't all come back at the same moment
+            await asyncio.sleep(random.uniform(0, base_delay * 2 ** attempt))
+
+
+class AgentOrchestrator:
+    # Runs independent agent calls concurrently under one rate limiter, so a
+    # batch takes as long as its slowest call rather than the sum of them.
+
+    def __init__(self, limiter=None, deadline=120.0):
+        self.limiter = limiter
+        self.deadline = deadline
+
+    async def gather(self, calls):
+        names = list(calls)
+        results = await asyncio.wait_for(asyncio.gather(*calls.values()), timeout=self.deadline)
+        return dict(zip(names, results))
+
+    def run(self, calls):
+        return asyncio.run(self.gather(calls))
@@ -0,0 +1,73 @@
+import hashlib
+import re
+
+# Emails arrive flattened to one line, so message boundaries are found from
+# the reply headers Outlook leaves behind ("From ... Sent ... To ...").
+MESSAGE_START = re.compile(r"(?=\bFrom\s+\S+(?:\s+\S+){0,8}?\s+Sent\s)")
+REPLY_HEADER = re.compile(r"^From\s.*?\bSent\s.*?\bTo\s.*?(?:\bCc\s.*?)?\bSubject\s+", re.IGNORECASE)
+
+BOILERPLATE = [
+    # Support auto-acknowledgement, sometimes with its first letter cut off
+    re.compile(
+        r"(?:\S*\s+Support Team\s+)?This is an automated message\b.*?"
+        r"We have opened a case \d+ for your request(?:\s+Thank you very much(?:\s+\w+)*?\s+Support Team)?",
+        re.IGNORECASE
+    ),
+    re.compile(r"EXTERNAL Email Notification\b.*?Report Phish icon in the Outlook toolbar", re.IGNORECASE),
+    # Proofpoint-rewritten links, often glued to the preceding word
+    re.compile(r"https?:?/*urldefense\S*", re.IGNORECASE),
+    re.compile(r"\bcid:?image\d+\S*", re.IGNORECASE),
+    # Salesforce thread ids
+    re.compile(r"\bref:?_?00D\w+?:?ref\b")
+]
+
+
+def _normalize(text):
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def _fingerprint(message):
+    body = REPLY_HEADER.sub("", message)
+    return re.sub(r"[^a-z0-9]+", " ", body.lower()).strip()
+
+
+def strip_boilerplate(text):
+    for pattern in BOILERPLATE:
+        text = pattern.sub(" ", text)
+    return _normalize(text)
+
+
+def split_messages(text):
+    return [message for message in (_normalize(part) for part in MESSAGE_START.split(text or "")) if message]
+
+
+def dedupe_messages(messages):
+    # Drop messages already seen by content hash, and messages whose text is
+    # wholly quoted inside a longer one that is kept.
+    kept, seen = [], set()
+    for message in messages:
+        fingerprint = _fingerprint(message)
+        digest = hashlib.sha1(fingerprint.encode("utf-8")).hexdigest()
+        if not fingerprint or digest in seen:
+            continue
+        seen.add(digest)
+        kept.append((fingerprint, message))
+
+    return [
+        message for fingerprint, message in kept
+        if not any(fingerprint != other and fingerprint in other for other, _ in kept)
+    ]
+
+
+def mail_chain(text):
+    messages = [strip_boilerplate(message) for message in split_messages(text)]
+    return "\n\n".join(dedupe_messages(messages)) or None
+
+
+def preprocess_cases(cases):
+    # Prompts and the mail_chain column both get the cleaned thread
+    processed = []
+    for case in cases:
+        chain = mail_chain(case.get("emails"))
+        processed.append({**case, "emails": chain or "", "mail_chain": chain})
+    return processed
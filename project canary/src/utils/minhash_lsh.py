@@ -0,0 +1,141 @@
+import hashlib
+import random
+import re
+
+_MERSENNE_PRIME = (1 << 61) - 1
+
+
+class MinHashLSH:
+
+    # Each document is reduced to num_perm min-hashes over its word shingles.
+    # The signature is split into bands, and a lookup only compares against
+    # documents sharing at least one band instead of the whole corpus.
+    #
+    # With containment=True, threshold applies to the share of the smaller
+    # document's shingles found in the larger one, estimated from the Jaccard
+    # estimate and both shingle counts. A reply that quotes an earlier thread
+    # scores near 1 there while its Jaccard stays low, so pair it with fewer
+    # rows per band to still surface such pairs as candidates. Documents under
+    # min_shingles never match on containment: they are contained in anything.
+    def __init__(self, threshold=0.7, num_perm=128, bands=16, shingle_size=3, seed=1,
+                 containment=False, min_shingles=10):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.seed = seed
+        self.containment = containment
+        self.min_shingles = min_shingles
+
+        rng = random.Random(seed)
+        self._permutations = [
+            (rng.randint(1, _MERSENNE_PRIME - 1), rng.randint(0, _MERSENNE_PRIME - 1))
+            for _ in range(num_perm)
+        ]
+        self._buckets = [{} for _ in range(bands)]
+        self._signatures = {}
+        self._sizes = {}
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def __contains__(self, key):
+        return key in self._signatures
+
+    def shingles(self, text):
+        words = re.sub(r"[^a-z0-9]+", " ", (text or "").lower()).split()
+        if len(words) < self.shingle_size:
+            return {" ".join(words)} if words else set()
+        return {
+            " ".join(words[i:i + self.shingle_size])
+            for i in range(len(words) - self.shingle_size + 1)
+        }
+
+    def signature(self, text):
+        return self._signature(self.shingles(text))
+
+    def _signature(self, shingles):
+        hashes = [
+            int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=8).digest(), "big")
+            for shingle in shingles
+        ]
+        if not hashes:
+            return None
+        return tuple(
+            min((a * h + b) % _MERSENNE_PRIME for h in hashes)
+            for a, b in self._permutations
+        )
+
+    def _band_keys(self, signature):
+        return [signature[i * self.rows:(i + 1) * self.rows] for i in range(self.bands)]
+
+    def insert(self, key, text):
+        self.remove(key)
+        shingles = self.shingles(text)
+        signature = self._signature(shingles)
+        if signature is None:
+            return []
+        matches = self._query_signature(signature, len(shingles))
+        self.restore(key, signature, len(shingles))
+        return matches
+
+    # Puts back an entry from entry() without matching it, e.g. when reloading
+    # a persisted index.
+    def restore(self, key, signature, size):
+        self.remove(key)
+        signature = tuple(signature)
+        self._signatures[key] = signature
+        self._sizes[key] = size
+        for bucket, band in zip(self._buckets, self._band_keys(signature)):
+            bucket.setdefault(band, set()).add(key)
+
+    def entry(self, key):
+        # (signature, shingle count), or None when key is not indexed
+        if key not in self._signatures:
+            return None
+        return self._signatures[key], self._sizes[key]
+
+    def remove(self, key):
+        signature = self._signatures.pop(key, None)
+        if signature is None:
+            return False
+        del self._sizes[key]
+        for bucket, band in zip(self._buckets, self._band_keys(signature)):
+            members = bucket.get(band)
+            if members is not None:
+                members.discard(key)
+                if not members:
+                    del bucket[band]
+        return True
+
+    def query(self, text, exclude=None):
+        shingles = self.shingles(text)
+        signature = self._signature(shingles)
+        if signature is None:
+            return []
+        return [key for key in self._query_signature(signature, len(shingles)) if key != exclude]
+
+    def _similarity(self, jaccard, size, other_size):
+        if not self.containment:
+            return jaccard
+        smaller = min(size, other_size)
+        if smaller < self.min_shingles:
+            return 0.0
+        # |A & B| = J * (|A| + |B|) / (1 + J)
+        return min(1.0, jaccard * (size + other_size) / (1 + jaccard) / smaller)
+
+    def _query_signature(self, signature, size):
+        candidates = set()
+        for bucket, band in zip(self._buckets, self._band_keys(signature)):
+            candidates.update(bucket.get(band, ()))
+
+        matches = []
+        for key in candidates:
+            other = self._signatures[key]
+            agreement = sum(1 for x, y in zip(signature, other) if x == y) / self.num_perm
+            if self._similarity(agreement, size, self._sizes[key]) >= self.threshold:
+                matches.append(key)
+        return sorted(matches)
@@ -0,0 +1,127 @@
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from utils.batching import CASE_FIELDS
+
+# Everything render_case puts in the prompt except the id, which changes
+# between windows without changing the answer.
+CONTENT_FIELDS = tuple(field for field in CASE_FIELDS if field != "id")
+
+
+def _digest(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def normalize(text):
+    return re.sub(r"\s+", " ", str(text or "")).strip().lower()
+
+
+class ResponseCache:
+    # Per-case LLM answers keyed on prompt template + model + case content, so
+    # a batch that mixes seen and unseen cases only sends the unseen ones.
+    # Only answers that depend on the case alone belong here: anything that
+    # refers to other cases in the batch (grouping) must not be cached.
+
+    def __init__(self, path="llm_cache.sqlite3", max_entries=100000, max_age=7 * 24 * 3600):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self.evict()
+
+    def key(self, template, model_name, case, context=None):
+        content = "\x1f".join(normalize(case.get(field)) for field in CONTENT_FIELDS)
+        context_hash = _digest(json.dumps(context, sort_keys=True, default=str)) if context is not None else ""
+        return _digest("\x1e".join([_digest(template), model_name, context_hash, _digest(content)]))
+
+    def lookup(self, template, model_name, cases, context=None):
+        # Returns (case id -> key, cached results by case id, cases to send)
+        keys = {case["id"].lower(): self.key(template, model_name, case, context) for case in cases}
+        now = time.time()
+        with self._lock:
+            found = {}
+            unique = list(set(keys.values()))
+            for start in range(0, len(unique), 500):
+                chunk = unique[start:start + 500]
+                rows = self._db.execute(
+                    f"SELECT key, value FROM responses WHERE key IN ({','.join('?' * len(chunk))}) AND created >= ?",
+                    chunk + [now - self.max_age]
+                ).fetchall()
+                found.update((key, json.loads(value)) for key, value in rows)
+            if found:
+                self._db.executemany("UPDATE responses SET accessed = ? WHERE key = ?", [(now, key) for key in found])
+                self._db.commit()
+
+            cached = {cid: found[key] for cid, key in keys.items() if key in found}
+            missing = [case for case in cases if case["id"].lower() not in cached]
+            self.hits += len(cached)
+            self.misses += len(missing)
+        return keys, cached, missing
+
+    def store(self, keys, results):
+        now = time.time()
+        rows = [(keys[cid], json.dumps(value), now, now) for cid, value in results.items() if cid in keys]
+        if not rows:
+            return
+        with self._lock:
+            self._db.executemany("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)", rows)
+            self._db.commit()
+        self.evict()
+
+    def evict(self):
+        with self._lock:
+            self._db.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.max_age,))
+            self._db.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "entries": entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def cached_map(cache, template, model_name, cases, context, generate):
+    # generate(cases) sends one request and returns {case id: value}
+    if cache is None:
+        return generate(cases)
+    keys, results, missing = cache.lookup(template, model_name, cases, context)
+    if missing:
+        fresh = generate(missing)
+        cache.store(keys, fresh)
+        results.update(fresh)
+    return results
+
+
+async def cached_map_async(cache, template, model_name, cases, context, generate):
+    if cache is None:
+        return await generate(cases)
+    keys, results, missing = cache.lookup(template, model_name, cases, context)
+    if missing:
+        fresh = await generate(missing)
+        cache.store(keys, fresh)
+        results.update(fresh)
+    return results
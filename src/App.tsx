@@ -29,7 +29,7 @@ function App() {
     ? { ...filters, status: 'Open' }
     : filters;
 
-  const { cases, loading: casesLoading } = useCases(tabFilters);
+  const { cases, loading: casesLoading, hasMore, loadingMore, loadMore } = useCases(tabFilters);
 
   const filteredCases = activeTab === 'high-priority'
     ? cases.filter(c => c.priority === 'High' || c.priority === 'Critical')
@@ -131,6 +131,17 @@ function App() {
                     onSelectCase={setSelectedCase}
                     selectedCaseId={selectedCase?.id}
                   />
+                  {hasMore && (
+                    <div className="mt-4 text-center">
+                      <button
+                        className="bg-blue-600 text-white px-4 py-2 rounded disabled:opacity-50"
+                        onClick={loadMore}
+                        disabled={loadingMore}
+                      >
+                        {loadingMore ? 'Loading...' : 'Load more'}
+                      </button>
+                    </div>
+                  )}
                 </>
               )}
             </main>
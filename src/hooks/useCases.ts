@@ -2,28 +2,44 @@ import { useState, useEffect } from 'react';
 import { Case, DashboardStats, SimilarCase, CaseFilters } from '../types/case';
 
 const API_BASE = '/api';
+// One page per request; further pages are only fetched on loadMore()
+const PAGE_SIZE = 50;
+// Columns the case table shows; the long text columns stay on the details page
+const LIST_FIELDS = [
+  'customer_name', 'priority', 'type', 'product', 'status', 'created_date', 'jira_id', 'snow_id'
+];
 
 export function useCases(filters?: CaseFilters) {
   const [cases, setCases] = useState<Case[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [error, setError] = useState<string | null>(null);
 
   useEffect(() => {
     fetchCases();
   }, [filters]);
 
+  async function fetchPage(cursor?: string) {
+    const params = new URLSearchParams();
+    if (filters) {
+      Object.entries(filters).forEach(([key, value]) => {
+        if (value) params.append(key, value);
+      });
+    }
+    params.set('fields', LIST_FIELDS.join(','));
+    params.set('limit', String(PAGE_SIZE));
+    if (cursor) params.set('cursor', cursor);
+    const res = await fetch(`${API_BASE}/cases?${params.toString()}`);
+    return res.json();
+  }
+
   async function fetchCases() {
     try {
       setLoading(true);
-      const params = new URLSearchParams();
-      if (filters) {
-        Object.entries(filters).forEach(([key, value]) => {
-          if (value) params.append(key, value);
-        });
-      }
-      const res = await fetch(`${API_BASE}/cases?${params.toString()}`);
-      const data = await res.json();
+      const data = await fetchPage();
       setCases(data.cases || []);
+      setNextCursor(data.next_cursor || null);
       setError(null);
     } catch (err) {
       setError('Failed to fetch cases');
@@ -32,7 +48,22 @@ export function useCases(filters?: CaseFilters) {
     }
   }
 
-  return { cases, loading, error };
+  async function loadMore() {
+    if (!nextCursor || loadingMore) return;
+    try {
+      setLoadingMore(true);
+      const data = await fetchPage(nextCursor);
+      setCases(prev => prev.concat(data.cases || []));
+      setNextCursor(data.next_cursor || null);
+      setError(null);
+    } catch (err) {
+      setError('Failed to fetch cases');
+    } finally {
+      setLoadingMore(false);
+    }
+  }
+
+  return { cases, loading, error, hasMore: nextCursor !== null, loadingMore, loadMore };
 }
 
 export function useDashboardStats() {